@@ -5,6 +5,24 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Running under ASGI
+------------------
+The public search and the profile GET are async views (see
+consultancy.asyncapi): under an ASGI server they run on the event loop and
+only borrow a thread for the duration of each database or cache call, so one
+process can hold many slow or idle clients open at once. Everything else is a
+regular DRF view and runs in Django's thread pool as under WSGI.
+
+    pip install uvicorn
+    uvicorn config.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+(``daphne config.asgi:application`` works the same way.) Start one worker per
+CPU core. Set CONN_MAX_AGE=0 under ASGI: connections are opened per request
+thread, and persistent ones would pile up rather than be reused. On Postgres,
+DB_POOL=1 shares a connection pool between those threads instead (see the
+database profile in settings). The same views still work under WSGI (``config.wsgi``), where Django
+runs each async view in its own short-lived event loop.
 """
 
 import os
@@ -1,6 +1,9 @@
 # settings.py
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-p=i(*2qp_^shmfz7o50c)f)5pfnq)f0-ce$rf8s2nt=&3%itck'
@@ -25,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'consultancy.instrumentation.RequestTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,32 +60,116 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
-DATABASES = {
+# SQLite by default; DB_ENGINE=postgres selects the Postgres profile below
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'consultancy_db'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Persistent connections, reused by a worker's requests for this many seconds
+            'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_POOL') == '1':
+        # A connection pool shared by the process's threads instead, for ASGI.
+        # requirements.txt ships psycopg2, which has no pool
+        try:
+            import psycopg  # noqa: F401
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured('DB_POOL=1 needs psycopg 3 and its pool: pip install "psycopg[binary,pool]"')
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Seconds a writer waits for the write lock before "database is locked"
+                'timeout': 20,
+                # Take the write lock when a transaction starts, not halfway through it
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Applied to every new SQLite connection (consultancy.database). In WAL mode
+# readers never wait for the writer, and NORMAL sync is still crash-safe there
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -20000,        # KiB, i.e. 20 MB per connection
+    'temp_store': 'memory',
+    'mmap_size': 134217728,
+}
+
+
+# Per-process memory cache by default; set CACHE_URL (e.g. redis://localhost:6379/0)
+# to share cached results and their invalidation across workers
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'consultancy',
+    }
+}
+if os.environ.get('CACHE_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_URL'],
     }
+
+# Seconds a cached result may be served; model signals invalidate earlier on change
+RESULT_CACHE_TIMEOUTS = {
+    'search': int(os.environ.get('SEARCH_CACHE_TIMEOUT', 300)),
+    # Invalidated on every change, so only bounds how long a missed one lingers
+    'stats': int(os.environ.get('STATS_CACHE_TIMEOUT', 3600)),
+}
+
+# With a per-process cache, seconds a search worker may go without reading the
+# change feed's cursor, and so miss other workers' changes (consultancy.views)
+SEARCH_VERSION_MAX_AGE = float(os.environ.get('SEARCH_VERSION_MAX_AGE', 1))
+
+# Per-process token -> user cache used by CachedTokenAuthentication; only used
+# with CACHE_URL, since revocations reach other workers through the shared cache
+TOKEN_CACHE = {
+    'size': int(os.environ.get('TOKEN_CACHE_SIZE', 10000)),
+    'timeout': int(os.environ.get('TOKEN_CACHE_TIMEOUT', 300)),
 }
 
-# DATABASES = {
-#         'default': {
-#             'ENGINE': 'django.db.backends.postgresql',
-#             'NAME': 'consultancy_db',  
-#             'USER': 'postgres',  
-#             'PASSWORD': 'postgres', 
-#             'HOST': 'localhost',  
-#             'PORT': '5432',
-#         }
-#     }
+# Admin change feed (consultancy.changes). Postgres can commit transactions out
+# of order, so the feed holds back entries younger than settle_seconds there;
+# SQLite commits one writer at a time. prune_changes keeps retention_days.
+CHANGE_FEED = {
+    'settle_seconds': int(os.environ.get('CHANGE_FEED_SETTLE_SECONDS', 5 if DB_ENGINE == 'postgres' else 0)),
+    'retention_days': int(os.environ.get('CHANGE_FEED_RETENTION_DAYS', 30)),
+}
 
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'consultancy.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'consultancy.instrumentation.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'consultancy.pagination.IdCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 
@@ -111,4 +199,28 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT= BASE_DIR / 'media'
 
+# Threads that render logo variants after an upload; 0 renders them inline
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+
+# Server-Timing header and slow request / query logging (consultancy.instrumentation)
+INSTRUMENTATION = {
+    # The header shows every client how long requests and queries take; opt in with SERVER_TIMING=1
+    'server_timing': os.environ.get('SERVER_TIMING', '0') == '1',
+    'slow_request_ms': float(os.environ.get('SLOW_REQUEST_MS', 500)),
+    'slow_query_ms': float(os.environ.get('SLOW_QUERY_MS', 100)),
+    # Runs of one SQL statement in a request that get it logged as a likely N+1
+    'n_plus_one': int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10)),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'consultancy.performance': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
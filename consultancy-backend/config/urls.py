@@ -1,8 +1,10 @@
 # urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.decorators.cache import cache_control
+from django.views.static import serve
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,4 +12,12 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
+    # Logo variants have content-hashed names, so they can be cached for good
+    urlpatterns += [
+        re_path(
+            rf"^{settings.MEDIA_URL.lstrip('/')}logos/variants/(?P<path>.*)$",
+            cache_control(public=True, max_age=31536000, immutable=True)(serve),
+            {'document_root': settings.MEDIA_ROOT / 'logos' / 'variants'},
+        ),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
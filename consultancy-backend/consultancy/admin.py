@@ -1,6 +1,24 @@
 from django.contrib import admin
-from .models import Consultancy,Course, User
+from .models import CatalogCourse, Consultancy,Course, Country, Tag, User
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    # Entries are shared and never change once created: the course n-gram index,
+    # search and full-text documents, the suggest index and cached results all
+    # assume so. Courses and profiles pick or create them instead.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 admin.site.register(Consultancy)
 admin.site.register(Course)
-admin.site.register(User)
\ No newline at end of file
+admin.site.register(CatalogCourse, ReadOnlyAdmin)
+admin.site.register(User)
+admin.site.register(Country, ReadOnlyAdmin)
+admin.site.register(Tag, ReadOnlyAdmin)
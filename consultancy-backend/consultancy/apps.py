@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ConsultancyConfig(AppConfig):
     name = 'consultancy'
+
+    def ready(self):
+        from . import database, instrumentation, signals  # noqa: F401
@@ -0,0 +1,97 @@
+# asyncapi.py
+"""
+A minimal ``@api_view`` for async views.
+
+DRF views are synchronous: under ASGI each request to one is handed to a
+worker thread for its whole lifetime. Views decorated here run on the event
+loop instead. They get a DRF Request (``query_params``, ``user``, ``auth``),
+token authentication through the async ORM, DRF permission classes and
+throttles, DRF's exception handler and the same JSON rendering, so clients
+cannot tell the difference. Methods the async view does not handle can be
+passed to a regular DRF view, which then runs in a thread as before.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from .authentication import AsyncTokenAuthentication
+from .instrumentation import TimedJSONRenderer
+
+
+class AsyncAPIView(APIView):
+    """
+    What DRF's permission classes, throttles and exception handler get as the
+    view; only its checks and error handling are used, never its dispatch.
+    """
+    authentication_classes = [AsyncTokenAuthentication]
+
+    def permission_denied(self, request, message=None, code=None):
+        # Authentication has already run, so the request cannot say which authenticator succeeded
+        if request.auth is None and not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        raise exceptions.PermissionDenied(detail=message, code=code)
+
+
+def render(request, response):
+    """Give a DRF Response the renderer an APIView would have negotiated"""
+    response.accepted_renderer = request.accepted_renderer
+    response.accepted_media_type = request.accepted_media_type
+    response.renderer_context = {}
+    return response
+
+
+async def authenticate(request):
+    # APIClient.force_authenticate() in tests marks the request like this
+    forced = getattr(request._request, '_force_auth_user', None)
+    if forced is not None:
+        return forced, getattr(request._request, '_force_auth_token', None)
+    return await AsyncTokenAuthentication().aauthenticate(request) or (None, None)
+
+
+def async_api_view(methods, permission_classes=(AllowAny,), throttle_classes=None, fallback=None):
+    """
+    Serve ``methods`` with the decorated coroutine and every other method with
+    the sync DRF view ``fallback`` (405 without one). Errors, including
+    Http404 and Django's PermissionDenied, go through DRF's exception handler.
+    """
+    if throttle_classes is None:
+        throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods and fallback is not None:
+                return await sync_to_async(fallback)(request, *args, **kwargs)
+
+            api_view = AsyncAPIView(permission_classes=permission_classes, throttle_classes=throttle_classes)
+            request = Request(request)
+            request.accepted_renderer = TimedJSONRenderer()
+            request.accepted_media_type = TimedJSONRenderer.media_type
+            api_view.request, api_view.args, api_view.kwargs = request, args, kwargs
+            api_view.format_kwarg = None
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                user, auth = await authenticate(request)
+                request.user, request.auth = user or AnonymousUser(), auth
+                api_view.check_permissions(request)
+                if throttle_classes:
+                    # Throttles count requests in the cache through its sync API
+                    await sync_to_async(api_view.check_throttles)(request)
+                response = await view(request, *args, **kwargs)
+            except Exception as exc:
+                response = api_view.handle_exception(exc)
+
+            if isinstance(response, Response):
+                render(request, response)
+            return response
+        return wrapper
+    return decorator
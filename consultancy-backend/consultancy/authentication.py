@@ -0,0 +1,114 @@
+# authentication.py
+"""
+Token authentication with the token -> user lookup cached in process.
+
+Resolved tokens are kept in a bounded LRU (settings.TOKEN_CACHE) under the
+``auth`` generation of consultancy.cache. Deleting a token and saving or
+deleting a user bump that generation (see consultancy.signals), so a revoked
+token or a deactivated user is refused by every worker on its next request.
+Changes that skip model signals, such as ``QuerySet.update()``, are only seen
+once the entry times out.
+
+That only holds while the generation is shared between workers, so tokens
+are only cached with a shared cache backend (CACHE_URL). With the default
+per-process cache every request looks its token up in the database.
+
+Each request gets its own User instance rebuilt from the cached field
+values, so nothing a view caches on ``request.user`` leaks into the next one.
+"""
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from .models import User
+from . import cache
+
+
+tokens = cache.LocalCache(settings.TOKEN_CACHE['size'], settings.TOKEN_CACHE['timeout'])
+
+
+def snapshot(user, token):
+    return (
+        [(field.attname, getattr(user, field.attname)) for field in User._meta.concrete_fields],
+        token.created,
+    )
+
+
+def restore(model, key, entry):
+    fields, created = entry
+    names, values = zip(*fields)
+    user = User.from_db(model.objects.db, names, values)
+    token = model(key=key, user=user, created=created)
+    token._state.adding = False
+    return (user, token)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication that skips the Token + User query for known tokens"""
+
+    def authenticate_credentials(self, key):
+        if not cache.shared():
+            return super().authenticate_credentials(key)
+        model = self.get_model()
+        # Read the generation first: an invalidation racing the query below
+        # then makes the entry stale instead of caching the old user
+        generation = cache.get_generation(cache.AUTH)
+        entry = tokens.get(key, generation)
+        if entry is not None:
+            return restore(model, key, entry)
+
+        user, token = super().authenticate_credentials(key)
+        tokens.set(key, snapshot(user, token), generation)
+        return (user, token)
+
+
+class AsyncTokenAuthentication(CachedTokenAuthentication):
+    """
+    CachedTokenAuthentication for async views.
+
+    Accepts the same ``Authorization: Token <key>`` header and raises the same
+    errors, but uses the async cache and ORM APIs so the event loop is not
+    blocked while it waits for them.
+    """
+
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _('Invalid token header. Token string should not contain spaces.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header. Token string should not contain invalid characters.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        model = self.get_model()
+        generation = None
+        if cache.shared():
+            generation = await cache.aget_generation(cache.AUTH)
+            entry = tokens.get(key, generation)
+            if entry is not None:
+                return restore(model, key, entry)
+
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        if generation is not None:
+            tokens.set(key, snapshot(token.user, token), generation)
+        return (token.user, token)
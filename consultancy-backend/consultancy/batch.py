@@ -0,0 +1,283 @@
+# batch.py
+"""
+Set-based admin operations on many consultancies, users or courses at once.
+
+A request picks its rows either by id or by filter:
+
+    {"action": "verify", "ids": [3, 4, 5]}
+    {"action": "delete", "filter": {"is_verified": false, "country": "Canada"}}
+    {"action": "update", "filter": {"is_consultancy": true}, "fields": {"is_staff": false}}
+
+The selected ids are worked through BATCH_SIZE at a time in one transaction,
+each batch with one UPDATE or one cascading delete rather than a fetch and
+save per row. Updates send no model signals and deletes run inside
+signals.batched(), so instead of the signal receivers rewriting documents
+and caches row by row, each operation refreshes search documents and
+full-text documents once per batch, and bumps each cache generation once.
+The rows written are logged for the admin change feed (consultancy.changes).
+"""
+from abc import ABC, abstractmethod
+
+from django.db import transaction
+from django.utils import timezone
+from .models import CatalogCourse, ChangeLog, Consultancy, Course, User, normalize_name
+from .serializers import ConsultancySerializer, CourseSerializer, UserSerializer
+from . import cache, documents, fulltext, signals, suggest
+
+
+MAX_IDS = 5000
+BATCH_SIZE = 500
+
+
+class BatchError(Exception):
+    pass
+
+
+def chunks(ids):
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+# ----------------- Filters -----------------
+def boolean(field):
+    def apply(queryset, value):
+        if not isinstance(value, bool):
+            raise BatchError(f'Filter "{field}" must be true or false')
+        return queryset.filter(**{field: value})
+    return apply
+
+
+def integer(field, lookup):
+    def apply(queryset, value):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise BatchError(f'Filter "{field}" must be an id')
+        return queryset.filter(**{lookup: value})
+    return apply
+
+
+def named(field, lookup):
+    def apply(queryset, value):
+        if not isinstance(value, str) or not value.strip():
+            raise BatchError(f'Filter "{field}" must be a name')
+        return queryset.filter(**{lookup: normalize_name(value)})
+    return apply
+
+
+# ----------------- Operations -----------------
+class Batch(ABC):
+    """The filters, updatable fields and set-based writes of one model"""
+    filters = {}
+    fields = ()
+    serializer_class = None
+    # Actions that are updates with fixed values
+    shortcuts = {}
+
+    def run(self, data, queryset):
+        """Apply the action in ``data`` to rows of ``queryset``; returns the counts"""
+        if not isinstance(data, dict):
+            raise BatchError('Send a JSON object')
+        action = data.get('action')
+        if action in self.shortcuts:
+            action, values = 'update', self.shortcuts[action]
+        elif action == 'update':
+            values = self.validate(data.get('fields'))
+        elif action != 'delete':
+            actions = ', '.join([*self.shortcuts, 'update', 'delete'])
+            raise BatchError(f'"action" must be one of: {actions}')
+
+        ids = self.select(data, queryset)
+        if action == 'delete':
+            return {'matched': len(ids), 'deleted': self.delete(ids) if ids else 0}
+        return {'matched': len(ids), 'updated': self.update(ids, values) if ids else 0}
+
+    def select(self, data, queryset):
+        """Ids of the rows picked by ``ids`` or ``filter``, in id order"""
+        ids, conditions = data.get('ids'), data.get('filter')
+        if (ids is None) == (conditions is None):
+            raise BatchError('Give either "ids" or "filter"')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                raise BatchError('"ids" must be a list of ids')
+            if len(ids) > MAX_IDS:
+                raise BatchError(f'At most {MAX_IDS} ids can be given at once')
+            queryset = queryset.filter(pk__in=ids)
+        else:
+            # An empty filter would select everything
+            if not isinstance(conditions, dict) or not conditions:
+                raise BatchError('"filter" must be a non-empty object')
+            unknown = [name for name in conditions if name not in self.filters]
+            if unknown:
+                raise BatchError(f"Unknown filters: {', '.join(unknown)}; use {', '.join(self.filters)}")
+            for name, value in conditions.items():
+                queryset = self.filters[name](queryset, value)
+        return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+    def validate(self, values):
+        if not isinstance(values, dict) or not values:
+            raise BatchError('"fields" must be a non-empty object')
+        unknown = [name for name in values if name not in self.fields]
+        if unknown:
+            raise BatchError(f"Cannot update: {', '.join(unknown)}; use {', '.join(self.fields)}")
+        serializer = self.serializer_class(data=values, partial=True)
+        if not serializer.is_valid():
+            raise BatchError('; '.join(
+                f"{name}: {' '.join(map(str, errors))}" for name, errors in serializer.errors.items()
+            ))
+        return serializer.validated_data
+
+    @abstractmethod
+    def update(self, ids, values):
+        """Write the validated ``values`` to the rows ``ids``; returns how many changed"""
+
+    @abstractmethod
+    def delete(self, ids):
+        """Delete the rows ``ids``; returns how many were deleted"""
+
+
+def delete_owners(users, consultancy_ids):
+    """Delete ``users``, which cascades to their consultancies ``consultancy_ids``"""
+    courses = list(Course.objects.filter(consultancy_id__in=consultancy_ids).values_list('pk', 'catalog_id'))
+    user_ids = list(users.values_list('pk', flat=True))
+    users.delete()
+    CatalogCourse.objects.prune({catalog_id for _, catalog_id in courses})
+    fulltext.remove_consultancies(consultancy_ids)
+    ChangeLog.objects.record(User, user_ids, deleted=True)
+    ChangeLog.objects.record(Consultancy, consultancy_ids, deleted=True)
+    ChangeLog.objects.record(Course, [pk for pk, _ in courses], deleted=True)
+
+
+def owners_deleted():
+    cache.invalidate(cache.SEARCH)
+    cache.invalidate(cache.AUTH)
+    cache.invalidate(cache.STATS)
+    suggest.invalidate()
+
+
+class ConsultancyBatch(Batch):
+    filters = {
+        'is_verified': boolean('is_verified'),
+        'country': named('country', 'country_links__country__key'),
+    }
+    fields = ('is_verified',)
+    serializer_class = ConsultancySerializer
+    shortcuts = {'verify': {'is_verified': True}, 'unverify': {'is_verified': False}}
+
+    @transaction.atomic
+    def update(self, ids, values):
+        updated = 0
+        for batch in chunks(ids):
+            changed = list(
+                Consultancy.objects.filter(pk__in=batch).exclude(**values).values_list('pk', flat=True)
+            )
+            updated += Consultancy.objects.filter(pk__in=changed).update(**values, updated_at=timezone.now())
+            ChangeLog.objects.record(Consultancy, changed)
+            documents.refresh(changed)
+        cache.invalidate(cache.SEARCH)
+        cache.invalidate(cache.STATS)
+        return updated
+
+    @transaction.atomic
+    def delete(self, ids):
+        # Deleting the owner deletes the consultancy, as admin_consultancy_detail does
+        with signals.batched():
+            for batch in chunks(ids):
+                delete_owners(User.objects.filter(consultancy__in=batch), batch)
+        owners_deleted()
+        return len(ids)
+
+
+class UserBatch(Batch):
+    filters = {
+        'is_consultancy': boolean('is_consultancy'),
+        'is_staff': boolean('is_staff'),
+    }
+    fields = ('is_consultancy', 'is_staff')
+    serializer_class = UserSerializer
+
+    @transaction.atomic
+    def update(self, ids, values):
+        updated = 0
+        for batch in chunks(ids):
+            changed = list(User.objects.filter(pk__in=batch).exclude(**values).values_list('pk', flat=True))
+            updated += User.objects.filter(pk__in=changed).update(**values)
+            ChangeLog.objects.record(User, changed)
+            # Profiles and search results carry the owner's flags
+            consultancy_ids = list(Consultancy.objects.filter(user__in=changed).values_list('pk', flat=True))
+            Consultancy.objects.filter(pk__in=consultancy_ids).touch()
+            documents.refresh(consultancy_ids)
+        cache.invalidate(cache.SEARCH)
+        cache.invalidate(cache.STATS)
+        cache.invalidate(cache.AUTH)
+        return updated
+
+    @transaction.atomic
+    def delete(self, ids):
+        with signals.batched():
+            for batch in chunks(ids):
+                consultancy_ids = list(Consultancy.objects.filter(user__in=batch).values_list('pk', flat=True))
+                delete_owners(User.objects.filter(pk__in=batch), consultancy_ids)
+        owners_deleted()
+        return len(ids)
+
+
+class CourseBatch(Batch):
+    filters = {
+        'consultancy': integer('consultancy', 'consultancy_id'),
+        'tag': named('tag', 'catalog__tag_links__tag__key'),
+    }
+    fields = ('name', 'tags')
+    serializer_class = CourseSerializer
+
+    @transaction.atomic
+    def update(self, ids, values):
+        """Move the selected offerings to the catalog courses with the new name or tags"""
+        name, tags = values.get('name'), values.get('tag_names')
+        updated = 0
+        for batch in chunks(ids):
+            offerings = Course.objects.filter(pk__in=batch)
+            rows = list(offerings.values_list('pk', 'catalog_id', 'consultancy_id'))
+            current = list(
+                CatalogCourse.objects.filter(pk__in={catalog_id for _, catalog_id, _ in rows})
+                .prefetch_related('tag_links__tag')
+            )
+            targets = CatalogCourse.objects.resolve(
+                (entry.name if name is None else name, entry.tag_names if tags is None else tags)
+                for entry in current
+            )
+            moves = {entry.pk: target for entry, target in zip(current, targets) if target.pk != entry.pk}
+            now = timezone.now()
+            for catalog_id, target in moves.items():
+                updated += offerings.filter(catalog_id=catalog_id).update(catalog=target, updated_at=now)
+            ChangeLog.objects.record(Course, [pk for pk, catalog_id, _ in rows if catalog_id in moves])
+            CatalogCourse.objects.prune([entry.pk for entry in current])
+            self.courses_changed({consultancy_id for _, _, consultancy_id in rows})
+        cache.invalidate(cache.SEARCH)
+        cache.invalidate(cache.STATS)
+        suggest.invalidate()
+        return updated
+
+    @transaction.atomic
+    def delete(self, ids):
+        with signals.batched():
+            for batch in chunks(ids):
+                offerings = Course.objects.filter(pk__in=batch)
+                rows = list(offerings.values_list('pk', 'catalog_id', 'consultancy_id'))
+                offerings.delete()
+                ChangeLog.objects.record(Course, [pk for pk, _, _ in rows], deleted=True)
+                CatalogCourse.objects.prune({catalog_id for _, catalog_id, _ in rows})
+                self.courses_changed({consultancy_id for _, _, consultancy_id in rows})
+        cache.invalidate(cache.SEARCH)
+        cache.invalidate(cache.STATS)
+        suggest.invalidate()
+        return len(ids)
+
+    def courses_changed(self, consultancy_ids):
+        """Once per batch, what the course signals do for every course"""
+        Consultancy.objects.filter(pk__in=consultancy_ids).touch()
+        fulltext.index_consultancies(consultancy_ids)
+        documents.refresh(consultancy_ids)
+
+
+consultancies = ConsultancyBatch()
+users = UserBatch()
+courses = CourseBatch()
@@ -0,0 +1,162 @@
+# benchmark.py
+"""
+Endpoint benchmarks over synthetic catalogs.
+
+For each dataset size the catalog is flushed and reseeded (see
+consultancy.synthetic), then every endpoint is requested through the Django
+test client. Each endpoint reports p50/p95 latency, SQL queries per request,
+response size and the peak Python heap of a single request. Peak memory is
+measured on a separate request, because tracemalloc slows down everything it
+traces.
+"""
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+import django
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from .models import Consultancy, User
+from . import synthetic
+
+
+def search_url(rng):
+    query = rng.choice([
+        rng.choice(synthetic.SUBJECTS), rng.choice(synthetic.TAGS), rng.choice(synthetic.SUBJECTS)[:4]
+    ])
+    country = rng.choice(['', *synthetic.COUNTRIES[:5]])
+    return '/api/search/?' + urlencode({'query': query, 'country': country})
+
+
+# name -> (url or url factory, who calls it)
+ENDPOINTS = {
+    'search': (search_url, None),
+    'profile': ('/api/profile/', 'consultancy'),
+    'admin_consultancies': ('/api/admin/consultancies/', 'admin'),
+    'admin_courses': ('/api/admin/courses/', 'admin'),
+}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def auth_headers(role):
+    if role is None:
+        return {}
+    if role == 'admin':
+        user, _ = User.objects.get_or_create(username='benchmark-admin', defaults={'is_staff': True})
+    else:
+        user = Consultancy.objects.select_related('user').order_by('id').first().user
+    token, _ = Token.objects.get_or_create(user=user)
+    return {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+
+def measure(client, url, headers, repeat, rng, cold_cache):
+    make_url = url if callable(url) else (lambda rng: url)
+    timings, queries, sizes = [], [], []
+
+    for _ in range(repeat):
+        target = make_url(rng)
+        if cold_cache:
+            django_cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(target, **headers)
+            timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{target} returned {response.status_code}')
+        queries.append(len(captured))
+        sizes.append(len(response.content))
+
+    if cold_cache:
+        django_cache.clear()
+    tracemalloc.start()
+    client.get(make_url(rng), **headers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'requests': repeat,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': max(queries),
+        'bytes': round(statistics.fmean(sizes)),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, courses=10, repeat=30, seed=0, cold_cache=True, endpoints=None, log=None):
+    """Benchmark every endpoint at every catalog size; returns the report dict"""
+    results = []
+    for size in sizes:
+        call_command('flush', interactive=False, verbosity=0)
+        django_cache.clear()
+        synthetic.seed_catalog(consultancies=size, courses=courses, seed=seed)
+
+        client = Client()
+        rng = random.Random(seed)
+        for name in endpoints or ENDPOINTS:
+            url, role = ENDPOINTS[name]
+            # One unmeasured request warms imports and the SQLite page cache
+            client.get(url(rng) if callable(url) else url, **auth_headers(role))
+            result = measure(client, url, auth_headers(role), repeat, rng, cold_cache)
+            result.update(endpoint=name, consultancies=size, courses=size * courses)
+            results.append(result)
+            if log:
+                log(result)
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'courses_per_consultancy': courses,
+            'repeat': repeat,
+            'seed': seed,
+            'cold_cache': cold_cache,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    """Per endpoint and size, the ratio of each metric to ``baseline``'s"""
+    previous = {(r['endpoint'], r['consultancies']): r for r in baseline['results']}
+    rows = []
+    for result in report['results']:
+        old = previous.get((result['endpoint'], result['consultancies']))
+        if old is None:
+            continue
+        rows.append({
+            'endpoint': result['endpoint'],
+            'consultancies': result['consultancies'],
+            **{
+                metric: round(result[metric] / old[metric], 2) if old[metric] else None
+                for metric in ('p50_ms', 'p95_ms', 'queries', 'peak_kib')
+            },
+        })
+    return rows
@@ -0,0 +1,141 @@
+# bulk.py
+"""
+Bulk course import and export.
+
+Imports accept CSV (a ``name`` column and an optional ``tags`` column with
+tags separated by ``;``) or JSON Lines (one ``{"name": ..., "tags": [...]}``
+object per line). Rows are validated with CourseSerializer a batch at a time;
+if any row fails nothing is written and every failing row is reported. A
+valid file is written with a handful of bulk statements in one transaction,
+and the search index, full-text documents and search cache are updated once
+for the whole file instead of once per course.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from .models import CatalogCourse, ChangeLog, Consultancy, Course
+from .serializers import CourseSerializer
+from . import cache, documents, fulltext, suggest
+
+
+MAX_ROWS = 5000
+BATCH_SIZE = 500
+TAG_SEPARATOR = ';'
+
+CSV_TYPES = {'text/csv', 'application/csv'}
+JSONL_TYPES = {'application/x-ndjson', 'application/jsonl', 'application/x-jsonlines', 'application/jsonlines'}
+CSV_EXTENSIONS = ('.csv',)
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+class BulkImportError(Exception):
+    pass
+
+
+def detect_format(content_type, filename=''):
+    filename = filename.lower()
+    if content_type in CSV_TYPES or filename.endswith(CSV_EXTENSIONS):
+        return 'csv'
+    if content_type in JSONL_TYPES or filename.endswith(JSONL_EXTENSIONS):
+        return 'jsonl'
+    raise BulkImportError('Send text/csv or application/x-ndjson, or upload a .csv or .jsonl file')
+
+
+def parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or 'name' not in reader.fieldnames:
+        raise BulkImportError('CSV needs a header row with a "name" column')
+    for row in reader:
+        tags = row.get('tags') or ''
+        yield {
+            'name': (row.get('name') or '').strip(),
+            'tags': [tag.strip() for tag in tags.split(TAG_SEPARATOR) if tag.strip()],
+        }
+
+
+def parse_jsonl(text):
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise BulkImportError(f'Line {number} is not valid JSON')
+        if not isinstance(row, dict):
+            raise BulkImportError(f'Line {number} is not a JSON object')
+        yield row
+
+
+def parse(data, fmt):
+    try:
+        text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+    except UnicodeDecodeError:
+        raise BulkImportError('File must be UTF-8 encoded')
+    rows = list(parse_csv(text) if fmt == 'csv' else parse_jsonl(text))
+    if not rows:
+        raise BulkImportError('No rows to import')
+    if len(rows) > MAX_ROWS:
+        raise BulkImportError(f'At most {MAX_ROWS} rows can be imported at once')
+    return rows
+
+
+def validate(rows):
+    """``(validated rows, [{row, errors}])``; rows are numbered from 1"""
+    validated, errors = [], []
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        serializer = CourseSerializer(data=batch, many=True)
+        if serializer.is_valid():
+            validated.extend(serializer.validated_data)
+            continue
+        # DRF reports list errors as a list (one entry per row) or, in newer
+        # releases, as a dict keyed by the index of each failing row
+        row_errors = serializer.errors
+        if isinstance(row_errors, list):
+            row_errors = dict(enumerate(row_errors))
+        errors.extend(
+            {'row': start + offset + 1, 'errors': detail}
+            for offset, detail in sorted(row_errors.items())
+            if detail
+        )
+    return validated, errors
+
+
+@transaction.atomic
+def import_courses(consultancy, rows):
+    """Create ``rows`` (validated course data) for ``consultancy``; returns the new courses"""
+    # Rows already in the catalog are linked to, the rest are added to it
+    catalog = CatalogCourse.objects.resolve((row['name'], row.get('tag_names', [])) for row in rows)
+    courses = Course.objects.bulk_create(
+        [Course(consultancy=consultancy, catalog=entry) for entry in catalog], batch_size=BATCH_SIZE
+    )
+    # What touch() would log, written in the same insert as the courses
+    ChangeLog.objects.bulk_create(
+        ChangeLog.objects.entries(Course, [course.pk for course in courses])
+        + ChangeLog.objects.entries(Consultancy, [consultancy.pk]),
+        batch_size=BATCH_SIZE,
+    )
+    Consultancy.objects.filter(pk=consultancy.pk).update(updated_at=timezone.now())
+    fulltext.index_consultancy(consultancy.id)
+    documents.refresh_consultancy(consultancy.id)
+    cache.invalidate(cache.SEARCH)
+    cache.invalidate(cache.STATS)
+    suggest.invalidate()
+    return courses
+
+
+def export_csv(queryset):
+    """Yield ``queryset``'s courses as CSV text, in the format imports accept"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['id', 'name', 'tags'])
+    for course in queryset.order_by('id').iterator(chunk_size=BATCH_SIZE):
+        writer.writerow([course.id, course.name, TAG_SEPARATOR.join(course.tag_names)])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
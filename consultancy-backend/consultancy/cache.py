@@ -0,0 +1,188 @@
+# cache.py
+"""
+Result caching with generation counters.
+
+Every cached result lives under a key that embeds the current generation of
+its namespace (``search``, ...). Model signals bump the generation when the
+underlying rows change, which orphans every older entry at once without
+having to know which keys exist; orphans simply age out through the TTL.
+Hit and miss counts are kept per namespace next to the entries.
+
+LocalCache keeps small, hot values inside the process instead, checked
+against the same generations. Those are only shared when the cache backend
+is (CACHE_URL, see settings): with the default per-process cache a worker
+never sees the bumps of another, so what must not outlive a change elsewhere
+checks shared() first.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+SEARCH = 'search'
+AUTH = 'auth'
+SUGGEST = 'suggest'
+STATS = 'stats'
+
+DEFAULT_TIMEOUT = 300
+
+# Backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def shared():
+    """Whether every worker uses the same cache, and so sees every generation bump"""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def _key(namespace, *parts):
+    return ':'.join(['consultancy', namespace, *map(str, parts)])
+
+
+def get_generation(namespace):
+    # Seeded from the clock so that a generation lost to eviction never
+    # reuses a number that older entries were stored under
+    return cache.get_or_set(_key(namespace, 'generation'), time.time_ns, timeout=None)
+
+
+def bump_generation(namespace):
+    """Move ``namespace`` to a new generation now; returns the new generation"""
+    try:
+        return cache.incr(_key(namespace, 'generation'))
+    except ValueError:
+        generation = time.time_ns()
+        cache.set(_key(namespace, 'generation'), generation, timeout=None)
+        return generation
+
+
+def invalidate(namespace):
+    """Bump ``namespace`` once the current transaction commits"""
+    transaction.on_commit(lambda: bump_generation(namespace))
+
+
+def _count(namespace, counter):
+    key = _key(namespace, counter)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def digest(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def _result_key(namespace, generation, params):
+    return _key(namespace, generation, digest(params))
+
+
+def cached(namespace, params, compute):
+    """
+    Return ``(value, hit)`` for ``params`` in ``namespace``, calling ``compute()``
+    on a miss. ``params`` must already be normalized; it is hashed into the key.
+    """
+    key = _result_key(namespace, get_generation(namespace), params)
+
+    value = cache.get(key)
+    if value is not None:
+        _count(namespace, 'hits')
+        return value, True
+
+    _count(namespace, 'misses')
+    value = compute()
+    timeout = settings.RESULT_CACHE_TIMEOUTS.get(namespace, DEFAULT_TIMEOUT)
+    cache.set(key, value, timeout)
+    return value, False
+
+
+# Async counterparts for async views, through the cache's async API
+
+async def aget_generation(namespace):
+    return await cache.aget_or_set(_key(namespace, 'generation'), time.time_ns, timeout=None)
+
+
+async def _acount(namespace, counter):
+    key = _key(namespace, counter)
+    if not await cache.aadd(key, 1, timeout=None):
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            await cache.aset(key, 1, timeout=None)
+
+
+async def acached(namespace, params, compute):
+    """cached() for async views; ``compute`` is a coroutine function"""
+    key = _result_key(namespace, await aget_generation(namespace), params)
+
+    value = await cache.aget(key)
+    if value is not None:
+        await _acount(namespace, 'hits')
+        return value, True
+
+    await _acount(namespace, 'misses')
+    value = await compute()
+    timeout = settings.RESULT_CACHE_TIMEOUTS.get(namespace, DEFAULT_TIMEOUT)
+    await cache.aset(key, value, timeout)
+    return value, False
+
+
+def stats(namespace):
+    hits = cache.get(_key(namespace, 'hits'), 0)
+    misses = cache.get(_key(namespace, 'misses'), 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'generation': get_generation(namespace),
+    }
+
+
+class LocalCache:
+    """
+    A bounded, thread-safe, in-process LRU cache. Entries expire ``timeout``
+    seconds after they were stored, or as soon as the generation they were
+    stored under is no longer the current one.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_generation, expires = entry
+            if stored_generation != generation or expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation):
+        with self._lock:
+            self._entries[key] = (value, generation, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
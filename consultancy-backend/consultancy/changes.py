@@ -0,0 +1,142 @@
+# changes.py
+"""
+Change feed for admin clients that keep a local copy of consultancies, users
+and courses.
+
+Every save and delete of those rows appends a ChangeLog entry in the same
+transaction: model signals log single rows, Consultancy.touch() logs the
+consultancies whose courses, countries or owner changed, and the bulk writers
+that bypass signals log their rows themselves. ``seq`` only grows, so a
+client polls ``/api/admin/changes/?since=<cursor>`` with the cursor of its
+previous poll and gets the current state of every row changed since, once
+however often it changed, and the ids of deleted rows. A poll reads at most
+PAGE entries; ``more`` says there are others to fetch right away.
+
+A poll without ``since`` returns only the current cursor: take it before
+loading the full lists, then poll from it. ``manage.py prune_changes`` drops
+old entries; a cursor older than what is left gets CursorExpired (410), and
+the client starts over from the lists.
+
+On SQLite, writers run one at a time, so entries commit in ``seq`` order. On
+Postgres a transaction can commit after a later one, so entries younger than
+settings.CHANGE_FEED['settle_seconds'] are held back: a cursor never passes
+an entry that a transaction shorter than that has yet to commit.
+"""
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+from .models import ChangeLog, Consultancy, Course, User
+from .readers import ConsultancyReader
+from .serializers import CourseSerializer, UserSerializer
+
+
+PAGE = 500
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def consultancy_rows(ids):
+    reader = ConsultancyReader()
+    return reader.serialize(reader.values(Consultancy.objects.filter(pk__in=ids).order_by('id')))
+
+
+def user_rows(ids):
+    return UserSerializer(User.objects.filter(pk__in=ids).order_by('id'), many=True).data
+
+
+def course_rows(ids):
+    return CourseSerializer(Course.objects.with_related().filter(pk__in=ids).order_by('id'), many=True).data
+
+
+# Entry kind -> (response key, current rows for ids)
+KINDS = {
+    'consultancy': ('consultancies', consultancy_rows),
+    'user': ('users', user_rows),
+    'course': ('courses', course_rows),
+}
+
+
+def visible():
+    entries = ChangeLog.objects.all()
+    settle = settings.CHANGE_FEED['settle_seconds']
+    if settle:
+        entries = entries.filter(created_at__lte=timezone.now() - timedelta(seconds=settle))
+    return entries
+
+
+def page(cursor, more=False):
+    return {
+        'cursor': cursor,
+        'more': more,
+        **{key: [] for key, _ in KINDS.values()},
+        'deleted': {key: [] for key, _ in KINDS.values()},
+    }
+
+
+def version():
+    """
+    The current cursor, which moves with every change to a consultancy, user
+    or course. Read from the database, so unlike cache generations it is the
+    same in every worker.
+    """
+    return visible().aggregate(seq=Max('seq'))['seq'] or 0
+
+
+async def aversion():
+    return (await visible().aaggregate(seq=Max('seq')))['seq'] or 0
+
+
+# This process's last read of the cursor, for arecent_version()
+_recent = {'seq': 0, 'read_at': -math.inf}
+
+
+async def arecent_version(max_age):
+    """
+    aversion(), read from the database at most once every ``max_age`` seconds
+    in this process; for callers that may trail other processes' changes by
+    that long.
+    """
+    now = time.monotonic()
+    if now - _recent['read_at'] >= max_age:
+        _recent.update(seq=await aversion(), read_at=now)
+    return _recent['seq']
+
+
+def latest():
+    """Only the current cursor, to poll from after loading the full lists"""
+    return page(version())
+
+
+def poll(since):
+    """Rows changed and deleted after the cursor ``since``"""
+    oldest = ChangeLog.objects.aggregate(seq=Min('seq'))['seq']
+    if oldest is not None and since < oldest - 1:
+        raise CursorExpired('Changes since this cursor are no longer kept; reload the lists')
+
+    entries = list(
+        visible().filter(seq__gt=since).order_by('seq').values_list('seq', 'kind', 'object_id', 'deleted')[:PAGE + 1]
+    )
+    more = len(entries) > PAGE
+    entries = entries[:PAGE]
+    result = page(entries[-1][0] if entries else since, more)
+
+    # The last entry of each row decides between its current state and a tombstone
+    changed = {}
+    for _, kind, object_id, deleted in entries:
+        changed[(kind, object_id)] = deleted
+    for kind, (key, rows) in KINDS.items():
+        saved = [object_id for (k, object_id), deleted in changed.items() if k == kind and not deleted]
+        gone = [object_id for (k, object_id), deleted in changed.items() if k == kind and deleted]
+        if saved:
+            result[key] = rows(saved)
+            # Deleted after this page's last entry; the tombstone comes later
+            found = {row['id'] for row in result[key]}
+            gone += [object_id for object_id in saved if object_id not in found]
+        result['deleted'][key] = sorted(gone)
+    return result
@@ -0,0 +1,43 @@
+# conditional.py
+"""
+Conditional GET for read endpoints.
+
+Views build a validator from something cheap (a row's updated_at, a cache
+generation, the change feed's cursor) before loading or serializing anything,
+and answer 304 Not Modified when the client already holds that version. A
+validator has to change in every worker when the data does, so cache
+generations only serve with a shared cache (consultancy.cache.shared). Responses carry
+``Cache-Control: no-cache`` so browsers keep them but always revalidate.
+"""
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date, parse_http_date
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest())
+
+
+def validators(etag, last_modified=None, private=False):
+    """Response headers for a representation with these validators"""
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache' if private else 'no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+    if private:
+        headers['Vary'] = 'Authorization'
+    return headers
+
+
+def not_modified(request, headers):
+    """A 304 (or 412) response if the request's preconditions say so, otherwise None"""
+    current = HttpResponse(headers=headers)
+    last_modified = headers.get('Last-Modified')
+    response = get_conditional_response(
+        request,
+        etag=headers['ETag'],
+        last_modified=last_modified and parse_http_date(last_modified),
+        response=current,
+    )
+    return None if response is current else response
@@ -0,0 +1,25 @@
+# database.py
+"""
+Connection setup for the database profiles in settings.
+
+SQLite takes one write lock for the whole file. With its default rollback
+journal, readers wait while a write commits; in WAL mode they keep reading
+the last committed state, so searches scale with the number of workers and
+only writers queue up behind each other (for up to the ``timeout`` option).
+settings.SQLITE_PRAGMAS is applied to every SQLite connection as it opens.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(connection, pragmas):
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection, settings.SQLITE_PRAGMAS)
@@ -0,0 +1,50 @@
+# documents.py
+"""
+Stored search results, one per verified consultancy.
+
+A SearchDocument holds the search result of a consultancy, rendered once by
+ConsultancyReader when the consultancy changes. Search picks the matching
+consultancies through the course, country and tag indexes (consultancy.search)
+and returns their stored payloads, with no serializers.
+
+Documents are rewritten in the saving transaction by consultancy.signals, and
+by the bulk writers (imports, logo variants, seeding) for the consultancies
+they touch. ``manage.py rebuild_search_documents`` rebuilds them all, which is
+also needed after a change to MEDIA_URL, since payloads carry file URLs.
+"""
+from .models import Consultancy, SearchDocument
+from .readers import ConsultancyReader
+
+
+def build(consultancies):
+    """SearchDocuments for a Consultancy queryset, whatever their verification"""
+    reader = ConsultancyReader()
+    return [
+        SearchDocument(consultancy_id=payload['id'], payload=payload)
+        for payload in reader.serialize(reader.values(consultancies))
+    ]
+
+
+def refresh(consultancy_ids):
+    """Rewrite the documents of these consultancies, dropping those no longer verified"""
+    consultancy_ids = list(consultancy_ids)
+    if not consultancy_ids:
+        return
+    SearchDocument.objects.filter(consultancy_id__in=consultancy_ids).delete()
+    SearchDocument.objects.bulk_create(
+        build(Consultancy.objects.filter(id__in=consultancy_ids, is_verified=True))
+    )
+
+
+def refresh_consultancy(consultancy_id):
+    refresh([consultancy_id])
+
+
+def rebuild(batch_size=500):
+    """Rewrite every document"""
+    SearchDocument.objects.all().delete()
+    ids = list(Consultancy.objects.filter(is_verified=True).order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), batch_size):
+        SearchDocument.objects.bulk_create(
+            build(Consultancy.objects.filter(id__in=ids[start:start + batch_size]))
+        )
@@ -0,0 +1,172 @@
+# fulltext.py
+"""
+Ranked full-text search over consultancies.
+
+One document per consultancy holds its name, description, course names and
+course tags. On SQLite the documents live in an FTS5 virtual table ranked with
+BM25; on Postgres in a weighted tsvector column with a GIN index, ranked with
+ts_rank_cd. Both tables are created by migration 0005 and kept in sync by
+consultancy.signals.
+
+Query text is reduced to word tokens, every token must match and the last
+one also matches as a prefix, so "computer sci" finds "Computer Science".
+"""
+import re
+
+from django.db import connection
+from django.db.models import Prefetch
+from .models import Consultancy, Course, catalog_prefetch
+
+
+TABLE = 'consultancy_fts'
+
+# Column weights: name, description, courses, tags
+SQLITE_WEIGHTS = (10.0, 1.0, 5.0, 3.0)
+
+# Decimals of relevance scores, which page cursors carry
+RELEVANCE_DIGITS = 6
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+class FullTextUnavailable(Exception):
+    pass
+
+
+def available():
+    """Whether the current database has a full-text backend (SQLite FTS5 or Postgres)"""
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def tokens(text):
+    return TOKEN.findall(text.lower())
+
+
+def document(consultancy):
+    courses = list(consultancy.courses.all())
+    return (
+        consultancy.name,
+        consultancy.description or '',
+        ' '.join(course.name for course in courses),
+        ' '.join(name for course in courses for name in course.tag_names),
+    )
+
+
+def index_consultancies(consultancy_ids=None, batch_size=500):
+    """(Re)write the documents of many consultancies, or of all of them when no ids are given"""
+    if not available():
+        return
+    consultancies = Consultancy.objects.only('id', 'name', 'description').prefetch_related(
+        Prefetch('courses', queryset=Course.objects.select_related('catalog')),
+        catalog_prefetch('courses__'),
+    )
+    with connection.cursor() as cursor:
+        if consultancy_ids is None:
+            cursor.execute(f'DELETE FROM {TABLE}')
+        else:
+            consultancy_ids = list(consultancy_ids)
+            consultancies = consultancies.filter(id__in=consultancy_ids)
+            _delete(cursor, consultancy_ids)
+
+        rows = []
+        for consultancy in consultancies.iterator(chunk_size=batch_size):
+            rows.append((consultancy.id, *document(consultancy)))
+            if len(rows) >= batch_size:
+                _insert(cursor, rows)
+                rows = []
+        _insert(cursor, rows)
+
+
+def index_consultancy(consultancy_id):
+    index_consultancies([consultancy_id])
+
+
+def remove_consultancy(consultancy_id):
+    remove_consultancies([consultancy_id])
+
+
+def remove_consultancies(consultancy_ids):
+    if available():
+        with connection.cursor() as cursor:
+            _delete(cursor, list(consultancy_ids))
+
+
+def _delete(cursor, consultancy_ids):
+    if not consultancy_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(consultancy_ids))
+    column = 'rowid' if connection.vendor == 'sqlite' else 'consultancy_id'
+    cursor.execute(f'DELETE FROM {TABLE} WHERE {column} IN ({placeholders})', consultancy_ids)
+
+
+def _insert(cursor, rows):
+    if not rows:
+        return
+    if connection.vendor == 'sqlite':
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, name, description, courses, tags) VALUES (%s, %s, %s, %s, %s)',
+            rows,
+        )
+    else:
+        cursor.executemany(
+            f"""
+            INSERT INTO {TABLE} (consultancy_id, document) VALUES (
+                %s,
+                setweight(to_tsvector('english', %s), 'A') ||
+                setweight(to_tsvector('english', %s), 'D') ||
+                setweight(to_tsvector('english', %s), 'B') ||
+                setweight(to_tsvector('english', %s), 'C')
+            )
+            """,
+            rows,
+        )
+
+
+def ranked(text, candidates, limit, after=None):
+    """
+    Up to ``limit`` ``(consultancy_id, relevance)`` pairs among ``candidates``
+    (a Consultancy queryset) matching ``text``, most relevant first.
+
+    ``after`` is the last pair of the previous page; ranking is keyset
+    paginated on (relevance, id) so later pages cost the same as the first.
+    Relevance is rounded to RELEVANCE_DIGITS decimals as a double in SQL, so
+    the value a cursor carries compares equal to the row it came from: on
+    Postgres ts_rank_cd() is a float4, which a float8 parameter never equals.
+    """
+    if not available():
+        raise FullTextUnavailable('Full-text search is not available on this database')
+    words = tokens(text)
+    if not words:
+        return []
+
+    candidate_sql, candidate_params = candidates.order_by().values('id').query.sql_with_params()
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{word}"' for word in words) + '*'
+        weights = ', '.join(str(w) for w in SQLITE_WEIGHTS)
+        # bm25() is lower-is-better; negate it so relevance grows with quality
+        sql = f"""
+            SELECT rowid AS id, round(-bm25({TABLE}, {weights}), {RELEVANCE_DIGITS}) AS relevance FROM {TABLE}
+            WHERE {TABLE} MATCH %s AND rowid IN ({candidate_sql})
+        """
+        params = [match, *candidate_params]
+    else:
+        query = ' & '.join(words) + ':*'
+        sql = f"""
+            SELECT consultancy_id AS id,
+                round(ts_rank_cd(document, to_tsquery('english', %s))::numeric, {RELEVANCE_DIGITS})::float8 AS relevance
+            FROM {TABLE}
+            WHERE document @@ to_tsquery('english', %s) AND consultancy_id IN ({candidate_sql})
+        """
+        params = [query, query, *candidate_params]
+
+    sql = f'SELECT id, relevance FROM ({sql}) ranked'
+    if after is not None:
+        last_id, last_relevance = after
+        sql += ' WHERE relevance < %s OR (relevance = %s AND id > %s)'
+        params += [last_relevance, last_relevance, last_id]
+    sql += ' ORDER BY relevance DESC, id LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], row[1]) for row in cursor.fetchall()]
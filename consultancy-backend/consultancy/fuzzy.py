@@ -0,0 +1,110 @@
+# fuzzy.py
+"""
+Typo correction for search queries, SymSpell style.
+
+The vocabulary is every word of every course name and tag. For each word
+the index stores all strings obtained by deleting up to MAX_DISTANCE
+characters (of its first PREFIX_LENGTH characters), pointing back to the
+word. A misspelled term generates its own deletes, and any vocabulary word
+sharing one is a candidate; the true edit distance is then checked only for
+those few candidates, so a lookup costs the same whatever the vocabulary
+size. The vocabulary lives in the typeahead index (consultancy.suggest) and
+is updated with it.
+"""
+import re
+from collections import defaultdict
+
+
+MAX_DISTANCE = 2
+# Deletes are only generated for this many leading characters; long words
+# still match, their tails are compared by the distance check
+PREFIX_LENGTH = 7
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def words(text):
+    return WORD.findall(text.casefold())
+
+
+def max_distance(term):
+    """How many edits a term of this length may be off by"""
+    if len(term) <= 2:
+        return 0
+    return 1 if len(term) <= 4 else MAX_DISTANCE
+
+
+def deletes(word, distance=MAX_DISTANCE):
+    """``word`` and every string made by deleting up to ``distance`` characters"""
+    found = {word}
+    edge = {word}
+    for _ in range(distance):
+        edge = {w[:i] + w[i + 1:] for w in edge for i in range(len(w))} - found
+        found |= edge
+    return found
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance between ``a`` and ``b``, or None if above ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return None
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class Vocabulary:
+    def __init__(self):
+        self.counts = {}                 # word -> occurrences
+        self.index = defaultdict(set)    # delete -> words
+
+    def add(self, word):
+        if word in self.counts:
+            self.counts[word] += 1
+            return
+        self.counts[word] = 1
+        for variant in deletes(word[:PREFIX_LENGTH]):
+            self.index[variant].add(word)
+
+    def discard(self, word):
+        count = self.counts.get(word)
+        if count is None:
+            return
+        if count > 1:
+            self.counts[word] = count - 1
+            return
+        del self.counts[word]
+        for variant in deletes(word[:PREFIX_LENGTH]):
+            self.index[variant].discard(word)
+            if not self.index[variant]:
+                del self.index[variant]
+
+    def __contains__(self, word):
+        return word in self.counts
+
+    def closest(self, term):
+        """The most common word nearest to ``term`` within its edit budget, or None"""
+        limit = max_distance(term)
+        if not limit:
+            return None
+        candidates = set()
+        for variant in deletes(term[:PREFIX_LENGTH], limit):
+            candidates |= self.index.get(variant, set())
+
+        best = None
+        for word in candidates:
+            distance = edit_distance(term, word, limit)
+            if distance is not None:
+                rank = (distance, -self.counts[word], word)
+                if best is None or rank < best:
+                    best = rank
+        return best and best[2]
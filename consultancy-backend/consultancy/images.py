@@ -0,0 +1,118 @@
+# images.py
+"""
+Resized variants of consultancy logos.
+
+An upload is stored as is; once the saving transaction commits, a worker pool
+renders a small thumbnail (search result cards) and a medium image (profile
+page) as WebP. Variant filenames carry a hash of their content, so they never
+change once written and can be served with a far-future ``Cache-Control``
+header; a new logo gets new names.
+
+settings.IMAGE_WORKERS sets the pool size; 0 renders inline, which tests
+and management commands use.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .models import ChangeLog, Consultancy
+from . import cache, documents
+
+
+logger = logging.getLogger(__name__)
+
+# name -> longest side in pixels; twice the largest size the frontend shows
+VARIANTS = {
+    'thumbnail': 128,
+    'medium': 400,
+}
+FORMAT = 'WEBP'
+QUALITY = 80
+DIRECTORY = 'logos/variants'
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(settings.IMAGE_WORKERS, thread_name_prefix='images')
+    return _executor
+
+
+def render(image, size):
+    """``image`` scaled down to fit ``size`` x ``size``, encoded as WebP bytes"""
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    variant.save(output, FORMAT, quality=QUALITY, method=4)
+    return output.getvalue()
+
+
+def variant_name(content, variant):
+    digest = hashlib.sha256(content).hexdigest()[:20]
+    return f'{DIRECTORY}/{digest}-{variant}.webp'
+
+
+def store(content, variant):
+    name = variant_name(content, variant)
+    # Same content, same name: an existing file is already the right one
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def render_variants(source):
+    """Render every variant of the open image file ``source``; returns {field: stored name}"""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        return {
+            f'profile_image_{variant}': store(render(image, size), variant)
+            for variant, size in VARIANTS.items()
+        }
+
+
+def process_profile_image(consultancy_id, name):
+    """Create the variants of ``name`` for a consultancy, unless its logo has changed since"""
+    try:
+        with default_storage.open(name) as source:
+            fields = render_variants(source)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError, ValueError):
+        # Not an image Pillow can read, or one it cannot convert
+        logger.exception('Could not create variants of %s', name)
+        return
+
+    with transaction.atomic():
+        # The filter skips the write if another upload replaced the logo meanwhile
+        updated = Consultancy.objects.filter(pk=consultancy_id, profile_image=name).update(
+            updated_at=timezone.now(), **fields
+        )
+        if updated:
+            ChangeLog.objects.record(Consultancy, [consultancy_id])
+            documents.refresh_consultancy(consultancy_id)
+            cache.invalidate(cache.SEARCH)
+
+
+def _run(consultancy_id, name):
+    try:
+        process_profile_image(consultancy_id, name)
+    finally:
+        # Pool threads outlive requests; don't leave their connections open
+        connections.close_all()
+
+
+def schedule(consultancy):
+    """Create the variants of ``consultancy``'s logo once the current transaction commits"""
+    args = (consultancy.pk, consultancy.profile_image.name)
+    if settings.IMAGE_WORKERS:
+        transaction.on_commit(lambda: executor().submit(_run, *args))
+    else:
+        transaction.on_commit(lambda: process_profile_image(*args))
@@ -0,0 +1,211 @@
+# instrumentation.py
+"""
+Per-request performance numbers, cheap enough to leave on in production.
+
+RequestTimingMiddleware counts every SQL query a request runs and how long
+they take, along with the time spent serializing and rendering the response,
+and, when settings.INSTRUMENTATION['server_timing'] is on, reports them in a
+``Server-Timing`` header (shown by browser devtools):
+
+    Server-Timing: db;dur=4.1;desc="3 queries", serialize;dur=1.2,
+                   render;dur=0.4, total;dur=9.8
+
+The header tells anyone what a request costs the server, so it is off unless
+asked for. Streamed responses never get it: their body runs its queries after
+the headers are sent. They are still counted, and logged once the body is done.
+
+Requests and queries slower than settings.INSTRUMENTATION thresholds are
+logged to ``consultancy.performance`` with the view that ran them, and so is
+any SELECT a request repeats often enough to suggest an N+1 pattern.
+
+Queries are seen through a database execute wrapper added to every
+connection as it opens; outside a request it does nothing but call through.
+The per-request numbers live in a context variable, so async views and the
+threads sync_to_async() hands their queries to report to the same request.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+
+logger = logging.getLogger('consultancy.performance')
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self, request):
+        self.request = request
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = {}    # SQL -> times run, params aside
+        self.timings = {}       # name -> seconds, see timed()
+
+    @property
+    def view(self):
+        match = self.request.resolver_match
+        return match._func_path if match else self.request.path
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.sql_time += duration
+        self.statements[sql] = self.statements.get(sql, 0) + 1
+        if duration * 1000 >= settings.INSTRUMENTATION['slow_query_ms']:
+            logger.warning('Slow query (%.1f ms) in %s: %s', duration * 1000, self.view, sql)
+
+    def add(self, name, duration):
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
+
+# ----------------- Queries -----------------
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - start)
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    install(connection)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name`` timing"""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(name, time.perf_counter() - start)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that reports its time as the ``render`` timing"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+# ----------------- Middleware -----------------
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this app was ready missed the signal
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats(request)
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(stats, response)
+
+    async def __acall__(self, request):
+        stats = RequestStats(request)
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(stats, response)
+
+    def finish(self, stats, response):
+        if response.streaming:
+            # The body runs queries as the server iterates it, after the headers have gone out:
+            # count those too, and report once it is done instead of in a header
+            if response.is_async:
+                response.streaming_content = self.aiterate(stats, response.streaming_content)
+            else:
+                response.streaming_content = self.iterate(stats, response.streaming_content)
+            return response
+
+        if settings.INSTRUMENTATION['server_timing']:
+            response['Server-Timing'] = self.server_timing(stats)
+        self.report(stats)
+        return response
+
+    def iterate(self, stats, content):
+        content = iter(content)
+        try:
+            while True:
+                token = _current.set(stats)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            self.report(stats)
+
+    async def aiterate(self, stats, content):
+        content = aiter(content)
+        try:
+            while True:
+                token = _current.set(stats)
+                try:
+                    chunk = await anext(content)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            self.report(stats)
+
+    def server_timing(self, stats):
+        total = time.perf_counter() - stats.start
+        metrics = [f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries"']
+        metrics += [f'{name};dur={duration * 1000:.1f}' for name, duration in stats.timings.items()]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def report(self, stats):
+        options = settings.INSTRUMENTATION
+        total = time.perf_counter() - stats.start
+        if total * 1000 >= options['slow_request_ms']:
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms',
+                stats.request.method, stats.request.path, stats.view,
+                total * 1000, stats.queries, stats.sql_time * 1000,
+            )
+        for sql, count in stats.statements.items():
+            # Batched writes repeat too; only reads are N+1 suspects
+            if count >= options['n_plus_one'] and sql.startswith('SELECT'):
+                logger.warning('Possible N+1 in %s: %d runs of %s', stats.view, count, sql)
@@ -0,0 +1,506 @@
+# loadtest.py
+"""
+Concurrent end-to-end load tests.
+
+A synthetic catalog (see consultancy.synthetic) is seeded, the app is started
+under ``workers`` server processes sharing one listening socket, and
+``concurrency`` virtual users replay MIX against it over real HTTP
+connections for ``duration`` seconds, after ``warmup`` seconds that are not
+counted. Every operation reports throughput, error rate and latency
+percentiles from a Histogram.
+
+The servers are small stand-ins from the standard library, so the harness
+runs offline with only the app's own requirements: ``config.wsgi`` through
+wsgiref with a thread per request, ``config.asgi`` through an asyncio
+HTTP/1.1 loop with keep-alive. They are not gunicorn or uvicorn, so compare
+a report with an earlier one from the same harness (``--baseline``) rather
+than reading it as the capacity of a production deployment.
+
+Virtual users send their next request as soon as the previous one returns,
+which finds the most the app can sustain. With ``rate``, they send on a
+fixed schedule instead and latency counts from the time a request was due,
+so a stalled server shows up in the percentiles rather than only slowing the
+senders down.
+"""
+import asyncio
+import http.client
+import json
+import math
+import multiprocessing
+import platform
+import random
+import socket
+import socketserver
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache as django_cache
+from django.db import connection, connections
+from .benchmark import git_revision, search_url
+from .models import Consultancy, Course, User
+from . import synthetic
+
+
+# Password given to the consultancy owners that virtual users log in as
+PASSWORD = 'loadtest-password'
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+# ----------------- Histogram -----------------
+class Histogram:
+    """
+    Latency counts in HdrHistogram's layout: every microsecond value below
+    ``2 * 10**digits`` has its own bucket, and above that buckets double in
+    width with every doubling of the value, so any value is kept to
+    ``digits`` significant digits in a few thousand buckets. Only counts are
+    kept, so histograms from several processes merge by adding them.
+    """
+
+    def __init__(self, digits=2):
+        # Values below ``linear`` get a bucket each, then half as many per doubling
+        self.linear = 1 << math.ceil(math.log2(2 * 10 ** digits))
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def index(self, value):
+        if value < self.linear:
+            return value
+        shift = value.bit_length() - self.linear.bit_length() + 1
+        return shift * (self.linear // 2) + (value >> shift)
+
+    def highest(self, index):
+        """Largest value counted in bucket ``index``"""
+        if index < self.linear:
+            return index
+        half = self.linear // 2
+        shift = index // half - 1
+        return ((index - shift * half + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, round(value))
+        index = self.index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct):
+        """Nearest-rank percentile, as the largest value of its bucket"""
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(pct / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.highest(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+
+class Tally:
+    """Latencies of the successful requests of one operation, and counts of the failed ones by status"""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = {}
+
+    def add(self, status, micros):
+        if 200 <= status < 400:
+            self.latency.record(micros)
+        else:
+            self.errors[status] = self.errors.get(status, 0) + 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        for status, count in other.errors.items():
+            self.errors[status] = self.errors.get(status, 0) + count
+
+    def summary(self, seconds):
+        failed = sum(self.errors.values())
+        requests = self.latency.total + failed
+        return {
+            'requests': requests,
+            'throughput_rps': round(requests / seconds, 1),
+            'error_rate': round(failed / requests, 4) if requests else 0,
+            # Status 0 is a request that got no response at all
+            'errors': {str(status): count for status, count in sorted(self.errors.items())},
+            'mean_ms': round(self.latency.mean() / 1000, 3),
+            **{f'p{pct:g}_ms': round(self.latency.percentile(pct) / 1000, 3) for pct in PERCENTILES},
+            'max_ms': round(self.latency.max / 1000, 3),
+        }
+
+
+# ----------------- Servers -----------------
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def wsgi_server(sock, app):
+    """A server for ``app`` on the listening ``sock``; call serve_forever()"""
+    server = ThreadingWSGIServer(sock.getsockname()[:2], QuietHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.server_name, server.server_port = 'localhost', sock.getsockname()[1]
+    server.setup_environ()
+    server.set_app(app)
+    return server
+
+
+async def call_asgi(app, scope, body):
+    """Run one request through ``app``; returns (status, headers, body)"""
+    finished = asyncio.Event()
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {'status': 500, 'headers': [], 'body': []}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Django listens for a disconnect while the view runs
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = message.get('headers', [])
+        elif message['type'] == 'http.response.body':
+            response['body'].append(message.get('body', b''))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return response['status'], response['headers'], b''.join(response['body'])
+
+
+def http_response(status, headers, body, keep_alive):
+    lines = [f"HTTP/1.1 {status} {http.client.responses.get(status, '')}"]
+    lines += [
+        f"{name.decode('latin-1')}: {value.decode('latin-1')}"
+        for name, value in headers
+        if name.lower() not in (b'content-length', b'connection')
+    ]
+    lines += [f'Content-Length: {len(body)}', f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def handle_connection(app, reader, writer):
+    """Serve the requests of one connection through ``app`` until either side closes it"""
+    client, server = writer.get_extra_info('peername'), writer.get_extra_info('sockname')
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            request_line, *lines = head[:-4].decode('latin-1').split('\r\n')
+            method, target, version = request_line.split(' ', 2)
+            headers = [
+                (name.strip().lower().encode('latin-1'), value.strip().encode('latin-1'))
+                for name, _, value in (line.partition(':') for line in lines)
+            ]
+            fields = dict(headers)
+            body = await reader.readexactly(int(fields.get(b'content-length', 0)))
+            path, _, query = target.partition('?')
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': version.split('/')[-1],
+                'method': method,
+                'scheme': 'http',
+                'path': unquote(path),
+                'raw_path': path.encode('latin-1'),
+                'query_string': query.encode('latin-1'),
+                'root_path': '',
+                'headers': headers,
+                'client': client[:2],
+                'server': server[:2],
+            }
+            status, response_headers, content = await call_asgi(app, scope, body)
+            keep_alive = version == 'HTTP/1.1' and fields.get(b'connection', b'').lower() != b'close'
+            writer.write(http_response(status, response_headers, content, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def asgi_server(sock, app):
+    """A started asyncio server for ``app`` on the listening ``sock``"""
+    return await asyncio.start_server(lambda reader, writer: handle_connection(app, reader, writer), sock=sock)
+
+
+def serve(sock, interface):
+    """Server worker process: load the app and serve it on ``sock`` until terminated"""
+    if interface == 'asgi':
+        from config.asgi import application
+
+        async def main():
+            server = await asgi_server(sock, application)
+            await server.serve_forever()
+        asyncio.run(main())
+    else:
+        from config.wsgi import application
+        wsgi_server(sock, application).serve_forever()
+
+
+def start_servers(interface, workers):
+    """Listen on a free local port and fork ``workers`` processes to serve it"""
+    sock = socket.create_server(('127.0.0.1', 0), backlog=1024)
+    # Workers open their own connections rather than share the parent's
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=serve, args=(sock, interface), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    return sock, processes
+
+
+# ----------------- Virtual users -----------------
+class VirtualUser:
+    """One client with its own keep-alive connection, logging in as ``account`` when it needs to"""
+
+    def __init__(self, address, account, rng, timeout=30):
+        self.connection = http.client.HTTPConnection(*address, timeout=timeout)
+        self.account = account
+        self.rng = rng
+        self.token = None
+
+    def send(self, method, path, data=None, auth=False):
+        """``(status, body)`` of one request"""
+        headers = {}
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+        if auth:
+            headers['Authorization'] = f'Token {self.token}'
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next request
+            self.connection.close()
+            raise
+
+
+def search(user):
+    return user.send('GET', search_url(user.rng))[0]
+
+
+def login(user):
+    status, body = user.send(
+        'POST', '/api/login/', {'username': user.account['username'], 'password': PASSWORD}
+    )
+    if status == 200:
+        user.token = json.loads(body)['token']
+    return status
+
+
+def profile(user):
+    return user.send('GET', '/api/profile/', auth=True)[0]
+
+
+def edit_course(user):
+    course_id = user.rng.choice(user.account['courses'])
+    tags = user.rng.sample(synthetic.TAGS, user.rng.randint(0, 3))
+    return user.send('PUT', f'/api/courses/edit/{course_id}/', {'tags': tags}, auth=True)[0]
+
+
+# name -> (operation, whether it needs a login first)
+OPERATIONS = {
+    'search': (search, False),
+    'login': (login, False),
+    'profile': (profile, True),
+    'edit_course': (edit_course, True),
+}
+
+# Operation -> share of requests
+MIX = {
+    'search': 80,
+    'profile': 10,
+    'login': 5,
+    'edit_course': 5,
+}
+
+
+def replay(user, mix, warmup_until, end, interval):
+    """Replay ``mix`` as one virtual user until ``end``; returns a Tally per operation"""
+    names, weights = list(mix), list(mix.values())
+    tallies = {}
+    # Paced users start spread over one interval instead of all at once
+    due = time.perf_counter() + (user.rng.random() * interval if interval else 0)
+    while due < end:
+        if interval:
+            pause = due - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+        name = user.rng.choices(names, weights)[0]
+        operation, needs_login = OPERATIONS[name]
+        if needs_login and user.token is None:
+            name, operation = 'login', login
+        begin = due if interval else time.perf_counter()
+        try:
+            status = operation(user)
+        except (OSError, http.client.HTTPException):
+            status = 0
+        finished = time.perf_counter()
+        if begin >= warmup_until:
+            tallies.setdefault(name, Tally()).add(status, (finished - begin) * 1e6)
+        due = due + interval if interval else finished
+    return tallies
+
+
+def merge(into, tallies):
+    for name, tally in tallies.items():
+        into.setdefault(name, Tally()).merge(tally)
+    return into
+
+
+def clients(address, accounts, first, count, mix, seed, warmup, duration, interval, queue):
+    """Client process: ``count`` virtual users in threads; puts their merged tallies on ``queue``"""
+    start = time.perf_counter()
+    users = [
+        VirtualUser(address, accounts[n % len(accounts)], random.Random(f'{seed}-{n}'))
+        for n in range(first, first + count)
+    ]
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        results = pool.map(
+            lambda user: replay(user, mix, start + warmup, start + warmup + duration, interval), users
+        )
+        tallies = {}
+        for result in results:
+            merge(tallies, result)
+    queue.put(tallies)
+
+
+def drive(address, accounts, concurrency, processes, mix, seed, warmup, duration, rate):
+    """Run ``concurrency`` virtual users spread over ``processes`` client processes"""
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    # Each user sends every ``interval`` seconds so that together they send ``rate`` a second
+    interval = concurrency / rate if rate else None
+    shares = [concurrency // processes + (i < concurrency % processes) for i in range(processes)]
+    workers, first = [], 0
+    for share in shares:
+        if share:
+            workers.append(context.Process(
+                target=clients,
+                args=(address, accounts, first, share, mix, seed, warmup, duration, interval, queue),
+            ))
+            first += share
+    for worker in workers:
+        worker.start()
+    tallies = {}
+    for _ in workers:
+        merge(tallies, queue.get(timeout=warmup + duration + 120))
+    for worker in workers:
+        worker.join()
+    return tallies
+
+
+# ----------------- Runs -----------------
+def prepare_accounts(count):
+    """Give the owners of the first ``count`` consultancies PASSWORD; returns their usernames and course ids"""
+    owners = list(Consultancy.objects.order_by('id').values_list('id', 'user_id', 'user__username')[:count])
+    # One hash for all of them, hashing is slow on purpose
+    User.objects.filter(pk__in=[user_id for _, user_id, _ in owners]).update(password=make_password(PASSWORD))
+    courses = {}
+    rows = Course.objects.filter(consultancy_id__in=[pk for pk, _, _ in owners]).order_by('id')
+    for course_id, consultancy_id in rows.values_list('id', 'consultancy_id'):
+        courses.setdefault(consultancy_id, []).append(course_id)
+    return [{'username': username, 'courses': courses.get(pk, [])} for pk, _, username in owners]
+
+
+def run(interface='wsgi', workers=2, concurrency=16, duration=30, warmup=5, rate=None, client_processes=1,
+        mix=None, consultancies=1000, courses=10, accounts=50, seed=0):
+    """Seed a catalog, load the app under ``workers`` server processes; returns the report dict"""
+    mix = mix or MIX
+    synthetic.seed_catalog(consultancies=consultancies, courses=courses, seed=seed)
+    logins = prepare_accounts(accounts)
+    django_cache.clear()
+
+    sock, servers = start_servers(interface, workers)
+    try:
+        tallies = drive(
+            sock.getsockname()[:2], logins, concurrency, client_processes, mix, seed, warmup, duration, rate
+        )
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.join()
+        sock.close()
+
+    overall = Tally()
+    for tally in tallies.values():
+        overall.merge(tally)
+    results = [
+        {'operation': name, **tallies[name].summary(duration)} for name in OPERATIONS if name in tallies
+    ]
+    results.append({'operation': 'total', **overall.summary(duration)})
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'interface': interface,
+            'workers': workers,
+            'concurrency': concurrency,
+            'client_processes': client_processes,
+            'rate': rate,
+            'duration': duration,
+            'warmup': warmup,
+            'mix': mix,
+            'consultancies': consultancies,
+            'courses_per_consultancy': courses,
+            'accounts': accounts,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    """Per operation, the ratio of throughput and latency to ``baseline``'s"""
+    previous = {r['operation']: r for r in baseline['results']}
+    rows = []
+    for result in report['results']:
+        old = previous.get(result['operation'])
+        if old is None:
+            continue
+        rows.append({
+            'operation': result['operation'],
+            **{
+                metric: round(result[metric] / old[metric], 2) if old[metric] else None
+                for metric in ('throughput_rps', 'p50_ms', 'p99_ms')
+            },
+            'error_rate': round(result['error_rate'] - old['error_rate'], 4),
+        })
+    return rows
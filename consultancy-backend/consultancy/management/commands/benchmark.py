@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from consultancy import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the read endpoints against synthetic catalogs of several sizes. '
+        'Runs in a throwaway test database and writes a JSON report.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000', help='Comma separated consultancy counts')
+        parser.add_argument('--courses', type=int, default=10, help='Courses per consultancy')
+        parser.add_argument('--repeat', type=int, default=30, help='Requests per endpoint and size')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--endpoint', action='append', choices=sorted(benchmark.ENDPOINTS),
+            help='Only benchmark this endpoint (repeatable)'
+        )
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Let the result caches serve repeated requests instead of clearing them'
+        )
+        parser.add_argument('--output', default='benchmark-report.json')
+        parser.add_argument('--baseline', help='Earlier report to compare against')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of integers')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = benchmark.run(
+                sizes,
+                courses=options['courses'],
+                repeat=options['repeat'],
+                seed=options['seed'],
+                cold_cache=not options['warm_cache'],
+                endpoints=options['endpoint'],
+                log=self.log_result,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if baseline:
+            self.stdout.write('\nRatio to baseline (lower is better):')
+            for row in benchmark.compare(report, baseline):
+                self.stdout.write(
+                    f"  {row['endpoint']:<22}{row['consultancies']:>8}  "
+                    f"p50 x{row['p50_ms']}  p95 x{row['p95_ms']}  "
+                    f"queries x{row['queries']}  memory x{row['peak_kib']}"
+                )
+
+    def log_result(self, result):
+        self.stdout.write(
+            f"{result['endpoint']:<22}{result['consultancies']:>8} consultancies  "
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+            f"{result['queries']:>3} queries  {result['peak_kib']:>9.1f} KiB peak"
+        )
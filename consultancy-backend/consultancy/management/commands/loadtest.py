@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from consultancy import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Load the app under several server processes with a mix of searches, logins, profile reads '
+        'and course edits. Runs in a throwaway database and writes a JSON report.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interface', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--workers', type=int, default=2, help='Server processes')
+        parser.add_argument('--concurrency', type=int, default=16, help='Virtual users')
+        parser.add_argument('--client-processes', type=int, default=1, help='Processes the virtual users run in')
+        parser.add_argument(
+            '--rate', type=float,
+            help='Requests per second to send on a fixed schedule; as fast as responses come back by default'
+        )
+        parser.add_argument('--duration', type=float, default=30, help='Seconds measured')
+        parser.add_argument('--warmup', type=float, default=5, help='Seconds run before measuring')
+        parser.add_argument(
+            '--mix', help=f"Operation weights, e.g. {','.join(f'{k}={v}' for k, v in loadtest.MIX.items())}"
+        )
+        parser.add_argument('--consultancies', type=int, default=1000)
+        parser.add_argument('--courses', type=int, default=10, help='Courses per consultancy')
+        parser.add_argument('--accounts', type=int, default=50, help='Consultancies the virtual users log in as')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='loadtest-report.json')
+        parser.add_argument('--baseline', help='Earlier report to compare against')
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix']) if options['mix'] else loadtest.MIX
+        for name in ('workers', 'concurrency', 'client_processes', 'consultancies', 'courses', 'accounts'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        if options['duration'] <= 0 or options['warmup'] < 0 or (options['rate'] is not None and options['rate'] <= 0):
+            raise CommandError('--duration and --rate must be positive, --warmup not negative')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # The server workers are separate processes, so the database has to be a file
+                connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'loadtest.sqlite3')
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                report = loadtest.run(
+                    interface=options['interface'],
+                    workers=options['workers'],
+                    concurrency=options['concurrency'],
+                    duration=options['duration'],
+                    warmup=options['warmup'],
+                    rate=options['rate'],
+                    client_processes=options['client_processes'],
+                    mix=mix,
+                    consultancies=options['consultancies'],
+                    courses=options['courses'],
+                    accounts=options['accounts'],
+                    seed=options['seed'],
+                )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for result in report['results']:
+            self.log_result(result)
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if baseline:
+            self.stdout.write('\nRatio to baseline (higher throughput and lower latency are better):')
+            for row in loadtest.compare(report, baseline):
+                self.stdout.write(
+                    f"  {row['operation']:<14}throughput x{row['throughput_rps']}  "
+                    f"p50 x{row['p50_ms']}  p99 x{row['p99_ms']}  error rate {row['error_rate']:+.2%}"
+                )
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            if name.strip() not in loadtest.OPERATIONS:
+                raise CommandError(f"Unknown operation {name.strip()!r}; use {', '.join(loadtest.OPERATIONS)}")
+            try:
+                mix[name.strip()] = float(weight)
+            except ValueError:
+                raise CommandError('--mix must look like search=80,login=5')
+        if not any(weight > 0 for weight in mix.values()):
+            raise CommandError('--mix needs a positive weight')
+        return mix
+
+    def log_result(self, result):
+        self.stdout.write(
+            f"{result['operation']:<14}{result['requests']:>8} requests  {result['throughput_rps']:>8.1f} req/s  "
+            f"errors {result['error_rate']:>6.2%}  p50 {result['p50_ms']:>8.2f} ms  "
+            f"p90 {result['p90_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+            f"p99.9 {result['p99.9_ms']:>8.2f} ms  max {result['max_ms']:>8.2f} ms"
+        )
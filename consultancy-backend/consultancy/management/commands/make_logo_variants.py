@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from consultancy import images
+from consultancy.models import Consultancy
+
+
+class Command(BaseCommand):
+    help = 'Create the resized logo variants that are missing (e.g. for logos uploaded before variants existed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recreate every variant, not just missing ones')
+
+    def handle(self, *args, **options):
+        consultancies = Consultancy.objects.exclude(profile_image='').exclude(profile_image=None)
+        if not options['all']:
+            consultancies = consultancies.filter(profile_image_thumbnail__in=['', None])
+
+        count = 0
+        for consultancy_id, name in consultancies.values_list('id', 'profile_image').iterator():
+            images.process_profile_image(consultancy_id, name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {count} logos'))
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from consultancy.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed entries older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHANGE_FEED['retention_days'])
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # The newest entry stays, so the cursor of a client that is up to date
+        # never looks expired while nothing changes
+        newest = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first()
+        deleted, _ = ChangeLog.objects.filter(created_at__lt=cutoff).exclude(seq=newest).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change feed entries'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from consultancy import cache, documents
+from consultancy.models import SearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized search document of every verified consultancy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Searches keep seeing the old documents until the new ones are complete
+        with transaction.atomic():
+            documents.rebuild(batch_size=options['batch_size'])
+            cache.invalidate(cache.SEARCH)
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {SearchDocument.objects.count()} search documents'
+        ))
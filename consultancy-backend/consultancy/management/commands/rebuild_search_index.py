@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from consultancy import fulltext, search
+from consultancy.models import CourseNgram
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course n-gram index and the full-text documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        search.rebuild_index(batch_size=options['batch_size'])
+        fulltext.index_consultancies(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {CourseNgram.objects.count()} postings'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from consultancy import synthetic
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic catalog of consultancies, courses, tags and countries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consultancies', type=int, default=100)
+        parser.add_argument('--courses', type=int, default=10, help='Courses per consultancy')
+        parser.add_argument('--verified-ratio', type=float, default=0.8)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible catalogs')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        created = synthetic.seed_catalog(
+            consultancies=options['consultancies'],
+            courses=options['courses'],
+            verified_ratio=options['verified_ratio'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {created} consultancies with {options['courses']} courses each"
+        ))
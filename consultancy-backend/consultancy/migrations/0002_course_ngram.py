@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-17 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# consultancy.search.ngrams as of this migration; later changes to the live
+# index must not change what the migration writes
+def ngrams(text):
+    """All 1..3 character n-grams of ``text``, lowercased"""
+    text = text.lower()
+    grams = set()
+    for size in range(1, 4):
+        for i in range(len(text) - size + 1):
+            grams.add(text[i:i + size])
+    return grams
+
+
+def index_existing_courses(apps, schema_editor):
+    Course = apps.get_model('consultancy', 'Course')
+    CourseNgram = apps.get_model('consultancy', 'CourseNgram')
+    postings = []
+    for course in Course.objects.all().iterator():
+        grams = set()
+        for term in [course.name, *course.tags]:
+            grams |= ngrams(term)
+        postings.extend(CourseNgram(course_id=course.id, gram=gram) for gram in grams)
+    CourseNgram.objects.bulk_create(postings, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseNgram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ngrams', to='consultancy.course')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('gram', 'course'), name='unique_course_ngram')],
+            },
+        ),
+        migrations.RunPython(index_existing_courses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-17 18:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_countries(apps, schema_editor):
+    Consultancy = apps.get_model('consultancy', 'Consultancy')
+    Country = apps.get_model('consultancy', 'Country')
+    ConsultancyCountry = apps.get_model('consultancy', 'ConsultancyCountry')
+
+    countries = {}
+    links = []
+    for consultancy in Consultancy.objects.only('id', 'countries_operated').iterator():
+        seen = set()
+        for name in consultancy.countries_operated or []:
+            name = str(name).strip()
+            key = name.casefold()
+            if not name or key in seen:
+                continue
+            seen.add(key)
+            if key not in countries:
+                countries[key] = Country.objects.create(key=key, name=name)
+            links.append(ConsultancyCountry(consultancy_id=consultancy.id, country=countries[key]))
+    ConsultancyCountry.objects.bulk_create(links, batch_size=500)
+
+
+def restore_countries(apps, schema_editor):
+    Consultancy = apps.get_model('consultancy', 'Consultancy')
+    ConsultancyCountry = apps.get_model('consultancy', 'ConsultancyCountry')
+
+    names = {}
+    for link in ConsultancyCountry.objects.select_related('country').order_by('id'):
+        names.setdefault(link.consultancy_id, []).append(link.country.name)
+    for consultancy_id, countries in names.items():
+        Consultancy.objects.filter(pk=consultancy_id).update(countries_operated=countries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0002_course_ngram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Country',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Countries',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsultancyCountry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consultancy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='country_links', to='consultancy.consultancy')),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consultancy_links', to='consultancy.country')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='consultancy',
+            name='countries',
+            field=models.ManyToManyField(blank=True, related_name='consultancies', through='consultancy.ConsultancyCountry', to='consultancy.country'),
+        ),
+        migrations.AddConstraint(
+            model_name='consultancycountry',
+            constraint=models.UniqueConstraint(fields=('consultancy', 'country'), name='unique_consultancy_country'),
+        ),
+        migrations.RunPython(copy_countries, restore_countries),
+        migrations.RemoveField(
+            model_name='consultancy',
+            name='countries_operated',
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 6.0 on 2026-10-17 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_tags(apps, schema_editor):
+    Course = apps.get_model('consultancy', 'Course')
+    Tag = apps.get_model('consultancy', 'Tag')
+    CourseTag = apps.get_model('consultancy', 'CourseTag')
+
+    tags = {}
+    links = []
+    for course in Course.objects.only('id', 'tag_list').iterator():
+        seen = set()
+        for name in course.tag_list or []:
+            name = str(name).strip()
+            key = name.casefold()
+            if not name or key in seen:
+                continue
+            seen.add(key)
+            if key not in tags:
+                tags[key] = Tag.objects.create(key=key, name=name)
+            links.append(CourseTag(course_id=course.id, tag=tags[key]))
+    CourseTag.objects.bulk_create(links, batch_size=500)
+
+
+def restore_tags(apps, schema_editor):
+    Course = apps.get_model('consultancy', 'Course')
+    CourseTag = apps.get_model('consultancy', 'CourseTag')
+
+    names = {}
+    for link in CourseTag.objects.select_related('tag').order_by('id'):
+        names.setdefault(link.course_id, []).append(link.tag.name)
+    for course_id, tags in names.items():
+        Course.objects.filter(pk=course_id).update(tag_list=tags)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0003_country'),
+    ]
+
+    operations = [
+        # Keep the JSON lists around until they are copied into CourseTag
+        migrations.RenameField(
+            model_name='course',
+            old_name='tags',
+            new_name='tag_list',
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='consultancy.course')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_links', to='consultancy.tag')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='courses', through='consultancy.CourseTag', to='consultancy.tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='coursetag',
+            constraint=models.UniqueConstraint(fields=('course', 'tag'), name='unique_course_tag'),
+        ),
+        migrations.RunPython(copy_tags, restore_tags),
+        migrations.RemoveField(
+            model_name='course',
+            name='tag_list',
+        ),
+    ]
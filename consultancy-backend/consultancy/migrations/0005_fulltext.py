@@ -0,0 +1,75 @@
+# Generated by Django 6.0 on 2026-10-17 19:20
+
+from django.db import migrations
+
+
+SQLITE_CREATE = """
+    CREATE VIRTUAL TABLE consultancy_fts USING fts5(
+        name, description, courses, tags,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+"""
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE consultancy_fts (
+        consultancy_id bigint PRIMARY KEY
+            REFERENCES consultancy_consultancy (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    'CREATE INDEX consultancy_fts_document ON consultancy_fts USING gin (document)',
+]
+
+POSTGRES_INSERT = """
+    INSERT INTO consultancy_fts (consultancy_id, document) VALUES (
+        %s,
+        setweight(to_tsvector('english', %s), 'A') ||
+        setweight(to_tsvector('english', %s), 'D') ||
+        setweight(to_tsvector('english', %s), 'B') ||
+        setweight(to_tsvector('english', %s), 'C')
+    )
+"""
+
+
+def create_fulltext_table(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        insert = 'INSERT INTO consultancy_fts (rowid, name, description, courses, tags) VALUES (%s, %s, %s, %s, %s)'
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_CREATE:
+            schema_editor.execute(statement)
+        insert = POSTGRES_INSERT
+    else:
+        return
+
+    Consultancy = apps.get_model('consultancy', 'Consultancy')
+    rows = []
+    for consultancy in Consultancy.objects.prefetch_related('courses__tag_links__tag'):
+        courses = list(consultancy.courses.all())
+        rows.append((
+            consultancy.id,
+            consultancy.name,
+            consultancy.description or '',
+            ' '.join(course.name for course in courses),
+            ' '.join(link.tag.name for course in courses for link in course.tag_links.all()),
+        ))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(insert, rows)
+
+
+def drop_fulltext_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS consultancy_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0004_tag'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_table, drop_fulltext_table),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0005_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consultancy',
+            name='profile_image_medium',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='logos/variants/'),
+        ),
+        migrations.AddField(
+            model_name='consultancy',
+            name='profile_image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='logos/variants/'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultancy',
+            index=models.Index(condition=models.Q(('is_verified', True)), fields=['id'], name='verified_consultancy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultancycountry',
+            index=models.Index(fields=['country', 'consultancy'], name='country_consultancy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursetag',
+            index=models.Index(fields=['tag', 'course'], name='tag_course_idx'),
+        ),
+    ]
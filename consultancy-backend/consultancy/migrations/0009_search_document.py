@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-17 20:00
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def file_url(name):
+    return default_storage.url(name) if name else None
+
+
+def build_documents(apps, schema_editor):
+    """The same documents consultancy.documents writes, from the models as of this migration"""
+    Consultancy = apps.get_model('consultancy', 'Consultancy')
+    SearchDocument = apps.get_model('consultancy', 'SearchDocument')
+
+    documents = []
+    consultancies = Consultancy.objects.filter(is_verified=True).select_related('user').prefetch_related(
+        'country_links__country', 'courses__tag_links__tag'
+    )
+    for consultancy in consultancies.iterator(chunk_size=500):
+        countries = [link.country.name for link in consultancy.country_links.all()]
+        courses = [
+            {
+                'id': course.id,
+                'name': course.name,
+                'tags': [link.tag.name for link in course.tag_links.all()],
+                'consultancy': consultancy.id,
+                'consultancy_name': consultancy.name,
+            }
+            for course in sorted(consultancy.courses.all(), key=lambda course: course.id)
+        ]
+        payload = {
+            'id': consultancy.id,
+            'name': consultancy.name,
+            'address': consultancy.address,
+            'description': consultancy.description,
+            'profile_image': file_url(consultancy.profile_image.name),
+            'profile_image_thumbnail': file_url(consultancy.profile_image_thumbnail.name or consultancy.profile_image.name),
+            'profile_image_medium': file_url(consultancy.profile_image_medium.name or consultancy.profile_image.name),
+            'phone_no': consultancy.phone_no,
+            'email': consultancy.user.email,
+            'website': consultancy.website,
+            'countries_operated': countries,
+            'is_verified': consultancy.is_verified,
+            'courses': courses,
+            'is_admin': consultancy.user.is_staff,
+            'is_consultancy': consultancy.user.is_consultancy,
+        }
+        documents.append(SearchDocument(
+            consultancy_id=consultancy.id,
+            courses=lines(course['name'] for course in courses),
+            tags=lines(tag for course in courses for tag in course['tags']),
+            countries=lines(countries),
+            payload=payload,
+        ))
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+def lines(names):
+    return ''.join(f'\n{name.strip().casefold()}' for name in names) + '\n'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0008_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('consultancy', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='consultancy.consultancy')),
+                ('courses', models.TextField()),
+                ('tags', models.TextField()),
+                ('countries', models.TextField()),
+                ('payload', models.JSONField()),
+            ],
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
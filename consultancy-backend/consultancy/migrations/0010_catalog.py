@@ -0,0 +1,63 @@
+# Generated by Django 6.0 on 2026-10-17 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0009_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogCourse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CatalogCourseTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('catalog_course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='consultancy.catalogcourse')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_links', to='consultancy.tag')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['tag', 'catalog_course'], name='tag_catalog_course_idx')],
+                'constraints': [models.UniqueConstraint(fields=('catalog_course', 'tag'), name='unique_catalog_course_tag')],
+            },
+        ),
+        migrations.AddField(
+            model_name='catalogcourse',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='catalog_courses', through='consultancy.CatalogCourseTag', to='consultancy.tag'),
+        ),
+        # Filled in by 0011, then made required by 0012
+        migrations.AddField(
+            model_name='course',
+            name='catalog',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='offerings', to='consultancy.catalogcourse'),
+        ),
+        migrations.AddField(
+            model_name='coursengram',
+            name='catalog_course',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ngrams', to='consultancy.catalogcourse'),
+        ),
+        # Copies that 0012 drops, nullable meanwhile so that 0011 can index
+        # catalog courses and 0012 can be reversed with rows present
+        migrations.AlterField(
+            model_name='course',
+            name='name',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='coursengram',
+            name='course',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ngrams', to='consultancy.course'),
+        ),
+    ]
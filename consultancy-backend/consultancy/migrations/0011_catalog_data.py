@@ -0,0 +1,168 @@
+# Generated by Django 6.0 on 2026-10-17 20:10
+
+import hashlib
+
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+
+# consultancy.search.ngrams as of this migration; later changes to the live
+# index must not change what the migration writes
+def ngrams(text):
+    """All 1..3 character n-grams of ``text``, lowercased"""
+    text = text.lower()
+    grams = set()
+    for size in range(1, 4):
+        for i in range(len(text) - size + 1):
+            grams.add(text[i:i + size])
+    return grams
+
+
+def normalize_name(name):
+    return name.strip().casefold()
+
+
+def catalog_key(name, tags):
+    tag_keys = sorted({normalize_name(tag) for tag in tags} - {''})
+    return hashlib.sha256('\n'.join([normalize_name(name), *tag_keys]).encode()).hexdigest()
+
+
+def lines(names):
+    """A search document column as of this migration: casefolded names, each enclosed in line breaks"""
+    return ''.join('\n' + normalize_name(name) for name in names) + '\n'
+
+
+def deduplicate_courses(apps, schema_editor):
+    """
+    One catalog course per distinct normalized name and tag set; every course
+    row offers one.
+
+    Course rows stay one to one, even where a consultancy offered the same
+    course twice: their ids are in clients' edit and delete URLs, and adding
+    a course still accepts a duplicate, as it did before the catalog. Only
+    linking refuses one.
+    """
+    Course = apps.get_model('consultancy', 'Course')
+    CourseTag = apps.get_model('consultancy', 'CourseTag')
+    CourseNgram = apps.get_model('consultancy', 'CourseNgram')
+    CatalogCourse = apps.get_model('consultancy', 'CatalogCourse')
+    CatalogCourseTag = apps.get_model('consultancy', 'CatalogCourseTag')
+
+    tags = {}
+    for course_id, tag_id, tag_name in CourseTag.objects.order_by('id').values_list('course_id', 'tag_id', 'tag__name'):
+        tags.setdefault(course_id, []).append((tag_id, tag_name))
+
+    # The first course with some content names its catalog entry
+    entries = {}
+    courses = list(Course.objects.order_by('id').values_list('id', 'name'))
+    for course_id, name in courses:
+        course_tags = tags.get(course_id, [])
+        key = catalog_key(name, [tag_name for _, tag_name in course_tags])
+        entries.setdefault(key, (name.strip(), [tag_id for tag_id, _ in course_tags]))
+
+    CatalogCourse.objects.bulk_create(
+        [CatalogCourse(key=key, name=name) for key, (name, _) in entries.items()], batch_size=BATCH_SIZE
+    )
+    catalog = dict(CatalogCourse.objects.values_list('key', 'id'))
+    CatalogCourseTag.objects.bulk_create(
+        [
+            CatalogCourseTag(catalog_course_id=catalog[key], tag_id=tag_id)
+            for key, (_, tag_ids) in entries.items()
+            for tag_id in tag_ids
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    offerings = []
+    for course_id, name in courses:
+        key = catalog_key(name, [tag_name for _, tag_name in tags.get(course_id, [])])
+        offerings.append(Course(id=course_id, catalog_id=catalog[key]))
+    Course.objects.bulk_update(offerings, ['catalog'], batch_size=BATCH_SIZE)
+
+    # The n-gram index moves from course rows to distinct catalog courses
+    CourseNgram.objects.all().delete()
+    tag_names = {}
+    for catalog_id, tag_name in CatalogCourseTag.objects.values_list('catalog_course_id', 'tag__name'):
+        tag_names.setdefault(catalog_id, []).append(tag_name)
+    postings = []
+    for catalog_id, name in CatalogCourse.objects.values_list('id', 'name'):
+        grams = set()
+        for term in [name, *tag_names.get(catalog_id, [])]:
+            grams |= ngrams(term)
+        postings.extend(CourseNgram(catalog_course_id=catalog_id, gram=gram) for gram in grams)
+    CourseNgram.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+
+    rewrite_documents(apps)
+
+
+def rewrite_documents(apps):
+    """Search documents (0009) show the names and tags of the catalog entries their courses now offer"""
+    Course = apps.get_model('consultancy', 'Course')
+    CatalogCourse = apps.get_model('consultancy', 'CatalogCourse')
+    CatalogCourseTag = apps.get_model('consultancy', 'CatalogCourseTag')
+    SearchDocument = apps.get_model('consultancy', 'SearchDocument')
+
+    tag_names = {}
+    for catalog_id, tag_name in CatalogCourseTag.objects.order_by('id').values_list('catalog_course_id', 'tag__name'):
+        tag_names.setdefault(catalog_id, []).append(tag_name)
+    names = dict(CatalogCourse.objects.values_list('id', 'name'))
+    catalog = dict(Course.objects.values_list('id', 'catalog_id'))
+
+    documents = []
+    for document in SearchDocument.objects.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        courses = [course for course in document.payload['courses'] if course['id'] in catalog]
+        for course in courses:
+            course['name'] = names[catalog[course['id']]]
+            course['tags'] = tag_names.get(catalog[course['id']], [])
+        document.payload['courses'] = courses
+        document.courses = lines(course['name'] for course in courses)
+        document.tags = lines(tag for course in courses for tag in course['tags'])
+        documents.append(document)
+    SearchDocument.objects.bulk_update(documents, ['payload', 'courses', 'tags'], batch_size=BATCH_SIZE)
+
+
+def copy_catalog_to_courses(apps, schema_editor):
+    """Undo: give every course row its own name and tags again"""
+    Course = apps.get_model('consultancy', 'Course')
+    CourseTag = apps.get_model('consultancy', 'CourseTag')
+    CourseNgram = apps.get_model('consultancy', 'CourseNgram')
+    CatalogCourse = apps.get_model('consultancy', 'CatalogCourse')
+    CatalogCourseTag = apps.get_model('consultancy', 'CatalogCourseTag')
+
+    tag_ids = {}
+    for catalog_id, tag_id in CatalogCourseTag.objects.order_by('id').values_list('catalog_course_id', 'tag_id'):
+        tag_ids.setdefault(catalog_id, []).append(tag_id)
+
+    courses = []
+    links = []
+    for course_id, catalog_id, name in Course.objects.values_list('id', 'catalog_id', 'catalog__name'):
+        courses.append(Course(id=course_id, name=name))
+        links.extend(CourseTag(course_id=course_id, tag_id=tag_id) for tag_id in tag_ids.get(catalog_id, []))
+    Course.objects.bulk_update(courses, ['name'], batch_size=BATCH_SIZE)
+    CourseTag.objects.bulk_create(links, batch_size=BATCH_SIZE)
+    # Back to the empty catalog of 0010, so that the migration can run again
+    Course.objects.update(catalog=None)
+    CatalogCourseTag.objects.all().delete()
+    CatalogCourse.objects.all().delete()
+
+    CourseNgram.objects.all().delete()
+    postings = []
+    for course in Course.objects.prefetch_related('tag_links__tag'):
+        grams = set()
+        for term in [course.name, *(link.tag.name for link in course.tag_links.all())]:
+            grams |= ngrams(term)
+        postings.extend(CourseNgram(course_id=course.id, gram=gram) for gram in grams)
+    CourseNgram.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0010_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_courses, copy_catalog_to_courses),
+    ]
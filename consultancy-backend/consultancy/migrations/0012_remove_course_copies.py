@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-17 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0011_catalog_data'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='course',
+            name='tags',
+        ),
+        migrations.DeleteModel(
+            name='CourseTag',
+        ),
+        migrations.RemoveField(
+            model_name='course',
+            name='name',
+        ),
+        migrations.RemoveConstraint(
+            model_name='coursengram',
+            name='unique_course_ngram',
+        ),
+        migrations.RemoveField(
+            model_name='coursengram',
+            name='course',
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='catalog',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='offerings', to='consultancy.catalogcourse'),
+        ),
+        migrations.AlterField(
+            model_name='coursengram',
+            name='catalog_course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ngrams', to='consultancy.catalogcourse'),
+        ),
+        migrations.AddConstraint(
+            model_name='coursengram',
+            constraint=models.UniqueConstraint(fields=('gram', 'catalog_course'), name='unique_catalog_course_ngram'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-17 20:30
+
+from django.db import migrations, models
+
+
+def lines(names):
+    """A search document column as 0009 wrote it: casefolded names, each enclosed in line breaks"""
+    return ''.join('\n' + name.strip().casefold() for name in names) + '\n'
+
+
+def fill_text_columns(apps, schema_editor):
+    """Undo: the text columns again, from the payloads"""
+    SearchDocument = apps.get_model('consultancy', 'SearchDocument')
+    documents = []
+    for document in SearchDocument.objects.order_by('pk').iterator(chunk_size=500):
+        courses = document.payload['courses']
+        document.courses = lines(course['name'] for course in courses)
+        document.tags = lines(tag for course in courses for tag in course['tags'])
+        document.countries = lines(document.payload['countries_operated'])
+        documents.append(document)
+    SearchDocument.objects.bulk_update(documents, ['courses', 'tags', 'countries'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0013_change_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, fill_text_columns),
+        # A default, so that the columns can be added back to existing rows
+        migrations.AlterField(
+            model_name='searchdocument',
+            name='countries',
+            field=models.TextField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='searchdocument',
+            name='courses',
+            field=models.TextField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='searchdocument',
+            name='tags',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='searchdocument',
+            name='countries',
+        ),
+        migrations.RemoveField(
+            model_name='searchdocument',
+            name='courses',
+        ),
+        migrations.RemoveField(
+            model_name='searchdocument',
+            name='tags',
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 6.0 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+
+# consultancy.search.ngrams as of this migration, or as of 0011 with fold=str.lower;
+# later changes to the live index must not change what the migration writes
+def ngrams(text, fold=str.casefold):
+    text = fold(text)
+    grams = set()
+    for size in range(1, 4):
+        for i in range(len(text) - size + 1):
+            grams.add(text[i:i + size])
+    return grams
+
+
+def reindex(apps, fold):
+    """
+    Rewrite the postings of the catalog courses whose name or tags fold
+    differently from lowercasing; ASCII-only entries are left as they are
+    """
+    CatalogCourse = apps.get_model('consultancy', 'CatalogCourse')
+    CourseNgram = apps.get_model('consultancy', 'CourseNgram')
+    courses = CatalogCourse.objects.prefetch_related('tag_links__tag').order_by('pk')
+    for course in courses.iterator(chunk_size=BATCH_SIZE):
+        terms = [course.name, *(link.tag.name for link in course.tag_links.all())]
+        if all(term.lower() == term.casefold() for term in terms):
+            continue
+        CourseNgram.objects.filter(catalog_course=course).delete()
+        grams = set()
+        for term in terms:
+            grams |= ngrams(term, fold)
+        CourseNgram.objects.bulk_create(CourseNgram(catalog_course=course, gram=gram) for gram in grams)
+
+
+def fold_names(apps, schema_editor):
+    CatalogCourse = apps.get_model('consultancy', 'CatalogCourse')
+    courses = []
+    for course in CatalogCourse.objects.only('pk', 'name').order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        course.folded_name = course.name.casefold()
+        courses.append(course)
+        if len(courses) >= BATCH_SIZE:
+            CatalogCourse.objects.bulk_update(courses, ['folded_name'])
+            courses = []
+    CatalogCourse.objects.bulk_update(courses, ['folded_name'])
+    reindex(apps, str.casefold)
+
+
+def unfold_names(apps, schema_editor):
+    reindex(apps, str.lower)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultancy', '0014_remove_search_document_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogcourse',
+            name='folded_name',
+            field=models.TextField(default=''),
+        ),
+        migrations.RunPython(fold_names, unfold_names),
+    ]
@@ -1,36 +1,375 @@
 # models.py
+import hashlib
+
 from django.db import models
+from django.dispatch import Signal
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 
+# Sent with ``instance`` by set_countries(), whose bulk link writes bypass
+# m2m_changed
+links_changed = Signal()
+
+# Sent with ``instances`` when CatalogCourse.objects.resolve() creates entries
+catalog_created = Signal()
+
+
 class User(AbstractUser):
     is_consultancy = models.BooleanField(default=False)
 
 
+def normalize_name(name):
+    """Lookup key of a country or tag name: trimmed and case-folded"""
+    return name.strip().casefold()
+
+
+class NameQuerySet(models.QuerySet):
+    def resolve(self, names):
+        """
+        Rows for ``names`` in input order, creating the missing ones.
+        Blank names and names differing only in case are dropped.
+        """
+        wanted = {}
+        for name in names:
+            name = name.strip()
+            if name:
+                wanted.setdefault(normalize_name(name), name)
+
+        rows = {row.key: row for row in self.filter(key__in=wanted)}
+        missing = [self.model(key=key, name=name) for key, name in wanted.items() if key not in rows]
+        if missing:
+            self.bulk_create(missing, ignore_conflicts=True)
+            rows.update((row.key, row) for row in self.filter(key__in=[m.key for m in missing]))
+        return [rows[key] for key in wanted]
+
+    def named(self, name):
+        return self.filter(key=normalize_name(name))
+
+    def with_prefix(self, prefix):
+        return self.filter(key__startswith=normalize_name(prefix))
+
+
+class NamedEntry(models.Model):
+    """A name stored once, looked up through its indexed, normalized key"""
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)
+
+    objects = NameQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.name
+
+
+class Country(NamedEntry):
+    class Meta:
+        verbose_name_plural = "Countries"
+
+
+class Tag(NamedEntry):
+    pass
+
+
+def consultancy_prefetches():
+    """Prefetch lookups for everything ConsultancySerializer reads besides the user"""
+    return [
+        models.Prefetch('courses', queryset=Course.objects.select_related('catalog')),
+        catalog_prefetch('courses__'),
+        models.Prefetch('country_links', queryset=ConsultancyCountry.objects.select_related('country')),
+    ]
+
+
+class ConsultancyQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load user and courses up front, so serializing a page is a fixed number of queries"""
+        return self.select_related('user').prefetch_related(*consultancy_prefetches())
+
+    def touch(self):
+        """Mark as modified without saving, e.g. when a course or link changed"""
+        ChangeLog.objects.record(self.model, self.values_list('id', flat=True))
+        return self.update(updated_at=timezone.now())
+
+
 class Consultancy(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='consultancy')
     name = models.CharField(max_length=100)
     address = models.TextField()
     description = models.TextField(null=True, blank=True)
     profile_image = models.ImageField(upload_to='logos/', null=True, blank=True)
+    # Resized copies of profile_image, written in the background by consultancy.images
+    profile_image_thumbnail = models.ImageField(upload_to='logos/variants/', null=True, blank=True, editable=False)
+    profile_image_medium = models.ImageField(upload_to='logos/variants/', null=True, blank=True, editable=False)
     phone_no = models.CharField(max_length=20, null=True, blank=True)  # Changed from phone_numbers
     website = models.URLField(null=True, blank=True)
-    countries_operated = models.JSONField(default=list, blank=True)
+    countries = models.ManyToManyField(
+        Country, through='ConsultancyCountry', related_name='consultancies', blank=True
+    )
     is_verified = models.BooleanField(default=False)
+    # Also bumped when its courses, countries or user change (consultancy.signals)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ConsultancyQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "Consultancies"
+        indexes = [
+            # Public search only reads verified consultancies, in id order
+            models.Index(fields=['id'], condition=models.Q(is_verified=True), name='verified_consultancy_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def logo_thumbnail(self):
+        """The logo for search results; the original until its variant is ready"""
+        return self.profile_image_thumbnail or self.profile_image
+
+    @property
+    def logo_medium(self):
+        return self.profile_image_medium or self.profile_image
+
+    @property
+    def country_names(self):
+        links = self.country_links.all()
+        if 'country_links' not in getattr(self, '_prefetched_objects_cache', {}):
+            links = links.select_related('country')
+        return [link.country.name for link in links]
+
+    def set_countries(self, names):
+        """Replace the operated countries, keeping the given order"""
+        self.country_links.all().delete()
+        ConsultancyCountry.objects.bulk_create(
+            ConsultancyCountry(consultancy=self, country=country)
+            for country in Country.objects.resolve(names)
+        )
+        # Drop a stale prefetch so country_names reflects the new list
+        getattr(self, '_prefetched_objects_cache', {}).pop('country_links', None)
+        links_changed.send(sender=Consultancy, instance=self)
+
+
+class ConsultancyCountry(models.Model):
+    consultancy = models.ForeignKey(
+        Consultancy, related_name='country_links', on_delete=models.CASCADE
+    )
+    country = models.ForeignKey(
+        Country, related_name='consultancy_links', on_delete=models.CASCADE
+    )
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['consultancy', 'country'], name='unique_consultancy_country'),
+        ]
+        indexes = [
+            # Consultancies by country, answered from the index alone
+            models.Index(fields=['country', 'consultancy'], name='country_consultancy_idx'),
+        ]
+
+
+def catalog_key(name, tags):
+    """Identity of a catalog course: its normalized name and set of tag keys, hashed"""
+    tag_keys = sorted({normalize_name(tag) for tag in tags} - {''})
+    content = '\n'.join([normalize_name(name), *tag_keys])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class CatalogQuerySet(models.QuerySet):
+    def resolve(self, courses):
+        """
+        Catalog entries for ``courses``, (name, tag names) pairs, in input
+        order; the missing ones are created with the first name and tag
+        order seen.
+        """
+        courses = [(name.strip(), list(tags)) for name, tags in courses]
+        keys = [catalog_key(name, tags) for name, tags in courses]
+        rows = {row.key: row for row in self.filter(key__in=set(keys))}
+
+        wanted = {}
+        for key, (name, tags) in zip(keys, courses):
+            if key not in rows:
+                wanted.setdefault(key, (name, tags))
+        if wanted:
+            self.bulk_create(
+                [self.model(key=key, name=name, folded_name=name.casefold()) for key, (name, _) in wanted.items()],
+                ignore_conflicts=True,
+            )
+            created = list(self.filter(key__in=wanted))
+            tag_rows = {tag.key: tag for tag in Tag.objects.resolve(
+                tag for _, entry_tags in wanted.values() for tag in entry_tags
+            )}
+            CatalogCourseTag.objects.bulk_create(
+                [
+                    CatalogCourseTag(catalog_course=entry, tag=tag_rows[key])
+                    for entry in created
+                    for key in dict.fromkeys(normalize_name(tag) for tag in wanted[entry.key][1] if tag.strip())
+                ],
+                ignore_conflicts=True,
+            )
+            rows.update((row.key, row) for row in created)
+            catalog_created.send(sender=CatalogCourse, instances=created)
+        return [rows[key] for key in keys]
+
+    def resolve_one(self, name, tags=()):
+        return self.resolve([(name, tags)])[0]
+
+    def prune(self, ids):
+        """Delete those of ``ids`` that no consultancy offers any more"""
+        return self.filter(pk__in=ids, offerings__isnull=True).delete()
+
+
+class CatalogCourse(models.Model):
+    """A distinct course, name and tags, stored once and offered by any number of consultancies"""
+    name = models.CharField(max_length=100)
+    # name.casefold(), which search matches against; databases only fold ASCII case themselves
+    folded_name = models.TextField(default='')
+    key = models.CharField(max_length=64, unique=True)
+    tags = models.ManyToManyField(Tag, through='CatalogCourseTag', related_name='catalog_courses', blank=True)
+
+    objects = CatalogQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def tag_names(self):
+        links = self.tag_links.all()
+        if 'tag_links' not in getattr(self, '_prefetched_objects_cache', {}):
+            links = links.select_related('tag')
+        return [link.tag.name for link in links]
+
+
+class CatalogCourseTag(models.Model):
+    catalog_course = models.ForeignKey(CatalogCourse, related_name='tag_links', on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, related_name='catalog_links', on_delete=models.CASCADE)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['catalog_course', 'tag'], name='unique_catalog_course_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'catalog_course'], name='tag_catalog_course_idx'),
+        ]
+
+
+def catalog_prefetch(prefix=''):
+    """Prefetch of the catalog tags behind ``<prefix>catalog``, for tag_names"""
+    return models.Prefetch(
+        f'{prefix}catalog__tag_links', queryset=CatalogCourseTag.objects.select_related('tag')
+    )
+
+
+class CourseQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('consultancy', 'catalog').prefetch_related(catalog_prefetch())
+
 
 class Course(models.Model):
+    """
+    A consultancy offering a catalog course. Name and tags belong to the
+    CatalogCourse; changing them moves the offering to the catalog entry
+    that matches, so other consultancies offering the course are unaffected.
+    """
     consultancy = models.ForeignKey(
         Consultancy, related_name='courses', on_delete=models.CASCADE
     )
-    name = models.CharField(max_length=100)
-    tags = models.JSONField(default=list, blank=True)
+    catalog = models.ForeignKey(CatalogCourse, related_name='offerings', on_delete=models.PROTECT)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CourseQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name} ({self.consultancy.name})"
+
+    @property
+    def name(self):
+        name = self.__dict__.get('_new_name')
+        return name if name is not None else self.catalog.name
+
+    @name.setter
+    def name(self, value):
+        # Applied by save(), which looks up the catalog entry
+        self._new_name = value
+
+    @property
+    def tag_names(self):
+        return self.catalog.tag_names if self.catalog_id else []
+
+    def save(self, *args, **kwargs):
+        name = self.__dict__.pop('_new_name', None)
+        if name is not None:
+            self.move_to(name, self.tag_names, save=False)
+        super().save(*args, **kwargs)
+        previous = self.__dict__.pop('_previous_catalog_id', None)
+        if previous and previous != self.catalog_id:
+            CatalogCourse.objects.prune([previous])
+
+    def move_to(self, name, tags, save=True):
+        """Offer the catalog course ``name`` with ``tags`` instead of the current one"""
+        self.__dict__.setdefault('_previous_catalog_id', self.catalog_id)
+        self.catalog = CatalogCourse.objects.resolve_one(name, tags)
+        if save:
+            self.save()
+
+    def set_tags(self, names):
+        """Replace the tags, keeping the given order"""
+        self.move_to(self.name, names)
+
+
+class CourseNgram(models.Model):
+    """One posting of the course search index (see consultancy.search)"""
+    catalog_course = models.ForeignKey(
+        CatalogCourse, related_name='ngrams', on_delete=models.CASCADE
+    )
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['gram', 'catalog_course'], name='unique_catalog_course_ngram'),
+        ]
+
+    def __str__(self):
+        return f"{self.gram!r} -> {self.catalog_course_id}"
+
+
+class SearchDocument(models.Model):
+    """The public search result of a verified consultancy, rendered ahead (see consultancy.documents)"""
+    consultancy = models.OneToOneField(
+        Consultancy, primary_key=True, related_name='search_document', on_delete=models.CASCADE
+    )
+    payload = models.JSONField()
+
+    def __str__(self):
+        return f"Search document of {self.consultancy_id}"
+
+
+class ChangeLogQuerySet(models.QuerySet):
+    def record(self, model, ids, deleted=False):
+        """Log that the ``model`` rows ``ids`` were saved, or deleted"""
+        return self.bulk_create(self.entries(model, ids, deleted), batch_size=500)
+
+    def entries(self, model, ids, deleted=False):
+        """Unsaved log rows for ``record``, for writing several models' changes in one insert"""
+        kind = model._meta.model_name
+        return [self.model(kind=kind, object_id=pk, deleted=deleted) for pk in ids]
+
+
+class ChangeLog(models.Model):
+    """
+    One save or delete of a consultancy, user or course, numbered by ``seq``,
+    for admin clients syncing through the change feed (see consultancy.changes)
+    """
+    seq = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20)  # model name: consultancy, user or course
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = ChangeLogQuerySet.as_manager()
 
     def __str__(self):
-        return f"{self.name} ({self.consultancy.name})"
\ No newline at end of file
+        return f"{self.seq}: {'deleted' if self.deleted else 'saved'} {self.kind} {self.object_id}"
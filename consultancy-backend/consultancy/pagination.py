@@ -0,0 +1,112 @@
+# pagination.py
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .instrumentation import timed
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key.
+
+    Each page is ``WHERE id > <last id> ORDER BY id LIMIT n``, so page 1000 costs
+    the same as page 1. The cursor is the opaque, base64 encoded position DRF
+    puts in ``next``/``previous``. Page size defaults to ``PAGE_SIZE`` and can be
+    chosen per request with ``?page_size=``.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views; the page is fetched with the async ORM"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, None)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by('-id' if reverse else 'id')
+        if position is not None:
+            queryset = queryset.filter(**{'id__lt' if reverse else 'id__gt': position})
+
+        # One extra row tells whether another page follows
+        results = [row async for row in queryset[offset:offset + self.page_size + 1]]
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None or offset > 0, position
+            self.has_previous, self.previous_position = following is not None, following
+        else:
+            self.has_next, self.next_position = following is not None, following
+            self.has_previous, self.previous_position = position is not None or offset > 0, position
+        return self.page
+
+
+def paginated_response(request, queryset, serializer_class):
+    """Serialize one page of ``queryset`` as ``{next, previous, results}``"""
+    paginator = IdCursorPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    with timed('serialize'):
+        data = serializer_class(page, many=True).data
+    return paginator.get_paginated_response(data)
+
+
+async def apaginated_response(request, queryset, reader):
+    """paginated_response() for async views; ``reader`` (see consultancy.readers) serializes the page"""
+    paginator = IdCursorPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    with timed('serialize'):
+        data = await reader.aserialize(page)
+    return paginator.get_paginated_response(data)
+
+
+def encode_cursor(position):
+    return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        return json.loads(urlsafe_b64decode(value.encode()))
+    except (ValueError, TypeError):
+        raise NotFound('Invalid cursor.')
+
+
+def ranked_response(request, rank, queryset, serializer_class):
+    """
+    Serialize one page of a relevance ranking as ``{next, previous, results}``.
+
+    ``rank(limit, after)`` returns ``(id, relevance)`` pairs best first, resuming
+    after the ``after`` pair; every result gains a ``relevance`` field.
+    ``queryset`` yields dicts with an ``id`` (a ``values()`` queryset).
+    """
+    page_size = IdCursorPagination().get_page_size(request)
+    ranking = rank(page_size + 1, decode_cursor(request.query_params.get('cursor')))
+    has_next = len(ranking) > page_size
+    ranking = ranking[:page_size]
+    last = ranking[-1] if ranking else None
+
+    rows = {row['id']: row for row in queryset.filter(id__in=[pk for pk, _ in ranking])}
+    ranking = [(pk, relevance) for pk, relevance in ranking if pk in rows]
+    with timed('serialize'):
+        results = serializer_class([rows[pk] for pk, _ in ranking], many=True).data
+    for data, (_, relevance) in zip(results, ranking):
+        data['relevance'] = relevance
+
+    next_url = None
+    if has_next:
+        next_url = replace_query_param(
+            request.build_absolute_uri(), 'cursor', encode_cursor(last)
+        )
+    return Response({'next': next_url, 'previous': None, 'results': results})
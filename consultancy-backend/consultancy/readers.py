@@ -0,0 +1,180 @@
+# readers.py
+"""
+Fast, read-only consultancy serialization for listings.
+
+ConsultancyReader produces exactly what ConsultancySerializer(many=True)
+does, key for key, but from ``.values()`` rows and a few flat queries, with
+no model instances and no DRF fields in between.
+
+It also implements sparse fieldsets: ``?fields=name,countries_operated``
+returns only those fields (plus ``id``), and only the columns and related
+tables they need are queried. Courses are part of the full representation;
+with ``?fields=`` they are only loaded when listed there or asked for with
+``?include=courses``.
+"""
+from collections import defaultdict, namedtuple
+
+from django.core.files.storage import default_storage
+from .models import CatalogCourseTag, ConsultancyCountry, Course
+from .serializers import ConsultancySerializer, CourseSerializer
+
+
+# Output field -> the values() columns it is built from
+COLUMNS = {
+    'id': ['id'],
+    'name': ['name'],
+    'address': ['address'],
+    'description': ['description'],
+    'profile_image': ['profile_image'],
+    'profile_image_thumbnail': ['profile_image_thumbnail', 'profile_image'],
+    'profile_image_medium': ['profile_image_medium', 'profile_image'],
+    'phone_no': ['phone_no'],
+    'email': ['user__email'],
+    'website': ['website'],
+    'countries_operated': [],
+    'is_verified': ['is_verified'],
+    # Courses repeat their consultancy's name
+    'courses': ['name'],
+    'is_admin': ['user__is_staff'],
+    'is_consultancy': ['user__is_consultancy'],
+}
+INCLUDES = ('courses',)
+
+Serialized = namedtuple('Serialized', 'data')
+
+
+def file_url(name):
+    return default_storage.url(name) if name else None
+
+
+class ConsultancyReader:
+    def __init__(self, fields=None, include=()):
+        unknown = [name for name in fields or () if name not in COLUMNS]
+        unknown += [name for name in include if name not in INCLUDES]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        if fields is None:
+            self.fields = list(ConsultancySerializer.Meta.fields)
+        else:
+            requested = {'id', *fields, *include}
+            # Always in the serializer's order, whatever order they were asked in
+            self.fields = [name for name in ConsultancySerializer.Meta.fields if name in requested]
+
+    @classmethod
+    def from_request(cls, request):
+        """The reader for ``?fields=`` and ``?include=``; ValueError on unknown names"""
+        fields = split(request.GET.get('fields', ''))
+        return cls(fields or None, split(request.GET.get('include', '')))
+
+    @property
+    def key(self):
+        """A cache key part that tells fieldsets apart"""
+        return ','.join(self.fields)
+
+    def values(self, queryset):
+        """``queryset`` narrowed to the columns this fieldset needs, as dicts"""
+        columns = dict.fromkeys(column for name in ['id', *self.fields] for column in COLUMNS[name])
+        return queryset.values(*columns)
+
+    # ----------------- Related rows -----------------
+    def related_querysets(self, ids):
+        querysets = {}
+        if 'countries_operated' in self.fields:
+            querysets['countries'] = ConsultancyCountry.objects.filter(
+                consultancy_id__in=ids
+            ).order_by('id').values_list('consultancy_id', 'country__name')
+        if 'courses' in self.fields:
+            courses = Course.objects.filter(consultancy_id__in=ids)
+            querysets['courses'] = courses.order_by('id').values_list(
+                'consultancy_id', 'id', 'catalog_id', 'catalog__name'
+            )
+            # Tags of each distinct catalog course once, however many offer it
+            querysets['tags'] = CatalogCourseTag.objects.filter(
+                catalog_course_id__in=courses.values('catalog_id')
+            ).order_by('id').values_list('catalog_course_id', 'tag__name')
+        return querysets
+
+    def related(self, ids):
+        return {name: list(qs) for name, qs in self.related_querysets(ids).items()}
+
+    async def arelated(self, ids):
+        return {name: [row async for row in qs] for name, qs in self.related_querysets(ids).items()}
+
+    # ----------------- Output -----------------
+    def build(self, rows, related):
+        countries = group(related.get('countries', ()))
+        tags = group(related.get('tags', ()))
+        courses = defaultdict(list)
+        for consultancy_id, course_id, catalog_id, name in related.get('courses', ()):
+            courses[consultancy_id].append((course_id, catalog_id, name))
+
+        return [self.build_row(row, countries, courses, tags) for row in rows]
+
+    def build_row(self, row, countries, courses, tags):
+        data = {}
+        for name in self.fields:
+            if name == 'countries_operated':
+                data[name] = countries.get(row['id'], [])
+            elif name == 'courses':
+                data[name] = [
+                    dict(zip(CourseSerializer.Meta.fields, (
+                        course_id, course_name, tags.get(catalog_id, []), row['id'], row['name']
+                    )))
+                    for course_id, catalog_id, course_name in courses.get(row['id'], [])
+                ]
+            elif name == 'profile_image':
+                data[name] = file_url(row['profile_image'])
+            elif name in ('profile_image_thumbnail', 'profile_image_medium'):
+                # The original stands in until the variant exists
+                data[name] = file_url(row[name] or row['profile_image'])
+            else:
+                data[name] = row[COLUMNS[name][0]]
+        return data
+
+    def serialize(self, rows):
+        rows = list(rows)
+        return self.build(rows, self.related([row['id'] for row in rows]) if rows else {})
+
+    async def aserialize(self, rows):
+        rows = list(rows)
+        return self.build(rows, await self.arelated([row['id'] for row in rows]) if rows else {})
+
+    def __call__(self, rows, many=True):
+        """Serializer-style entry point, so a reader can stand in for a serializer class"""
+        return Serialized(self.serialize(rows))
+
+    @property
+    def payloads(self):
+        """A reader for rows that carry this output prebuilt, see PayloadReader"""
+        return PayloadReader(self.fields)
+
+
+class PayloadReader:
+    """
+    Reads rows with a stored ``payload``, the full ConsultancyReader output
+    (consultancy.documents), cut down to ``fields``.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def serialize(self, rows):
+        return [{name: row['payload'][name] for name in self.fields} for row in rows]
+
+    async def aserialize(self, rows):
+        return self.serialize(rows)
+
+    def __call__(self, rows, many=True):
+        return Serialized(self.serialize(rows))
+
+
+def split(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def group(pairs):
+    grouped = defaultdict(list)
+    for key, value in pairs:
+        grouped[key].append(value)
+    return grouped
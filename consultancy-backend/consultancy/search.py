@@ -0,0 +1,143 @@
+# search.py
+"""
+Course search index.
+
+Every catalog course name and tag is broken into its 1, 2 and 3 character
+n-grams, stored in ``CourseNgram``; a course offered by many consultancies
+is indexed once. A query of up to three characters is a single exact
+posting lookup; a longer query needs every one of its trigrams to be present
+on a course, and the few candidates that survive are then checked with a
+substring match against their case-folded name and tag keys. Either way the
+search is a fixed number of indexed queries, however large the catalog is.
+
+Public consultancy search, search_consultancies(), picks the matching
+consultancies through this index and the country and tag indexes, then reads
+their stored results from the search documents of consultancy.documents.
+"""
+from django.db.models import Count, F, Prefetch, Q
+from .models import (
+    CatalogCourse, CatalogCourseTag, Consultancy, ConsultancyCountry, Course, CourseNgram, SearchDocument, Tag,
+    normalize_name,
+)
+
+
+NGRAM_SIZE = 3
+
+
+def ngrams(text):
+    """All 1..NGRAM_SIZE character n-grams of ``text``, case-folded"""
+    text = text.casefold()
+    grams = set()
+    for size in range(1, NGRAM_SIZE + 1):
+        for i in range(len(text) - size + 1):
+            grams.add(text[i:i + size])
+    return grams
+
+
+def course_terms(course):
+    """The strings a catalog course can be found by"""
+    return [course.name, *course.tag_names]
+
+
+def course_grams(course):
+    grams = set()
+    for term in course_terms(course):
+        grams |= ngrams(term)
+    return grams
+
+
+def index_catalog_courses(catalog_ids=None, batch_size=500):
+    """(Re)build the postings of many catalog courses at once, or of all of them when no ids are given"""
+    courses = CatalogCourse.objects.only('id', 'name').prefetch_related(
+        Prefetch('tag_links', queryset=CatalogCourseTag.objects.select_related('tag'))
+    )
+    stale = CourseNgram.objects.all()
+    if catalog_ids is not None:
+        courses = courses.filter(id__in=catalog_ids)
+        stale = stale.filter(catalog_course_id__in=catalog_ids)
+    stale.delete()
+
+    postings = []
+    for course in courses.iterator(chunk_size=batch_size):
+        postings.extend(CourseNgram(catalog_course_id=course.id, gram=gram) for gram in course_grams(course))
+        if len(postings) >= batch_size:
+            CourseNgram.objects.bulk_create(postings)
+            postings = []
+    CourseNgram.objects.bulk_create(postings)
+
+
+def rebuild_index(batch_size=500):
+    """Rebuild the whole index from the course catalog"""
+    index_catalog_courses(batch_size=batch_size)
+
+
+def query_grams(query):
+    """The n-grams a course must have to match ``query``, which is case-folded already"""
+    if len(query) <= NGRAM_SIZE:
+        return {query}
+    return {query[i:i + NGRAM_SIZE] for i in range(len(query) - NGRAM_SIZE + 1)}
+
+
+def matching_courses(query):
+    """Courses whose name or one of whose tags contains ``query`` (case-insensitive)"""
+    # Folding can lengthen the query (ß is ss), so it decides which lookup applies
+    query = query.casefold()
+    grams = query_grams(query)
+    candidates = (
+        CourseNgram.objects.filter(gram__in=grams)
+        .values('catalog_course_id')
+        .annotate(hits=Count('gram'))
+        .filter(hits=len(grams))
+        .values('catalog_course_id')
+    )
+    catalog = CatalogCourse.objects.filter(id__in=candidates)
+    if len(query) > NGRAM_SIZE:
+        # Trigrams can all be present without being contiguous. Both sides are
+        # folded: icontains would only fold ASCII letters on SQLite
+        catalog = catalog.filter(Q(folded_name__contains=query) | Q(tags__key__contains=query))
+    # Each distinct course is matched once, then expanded to its offerings
+    return Course.objects.filter(catalog__in=catalog.values('id'))
+
+
+def tagged_courses(tag='', tag_prefix=''):
+    """Courses carrying a tag, by exact name or by name prefix (both case-insensitive)"""
+    tags = Tag.objects.named(tag) if tag else Tag.objects.with_prefix(tag_prefix)
+    return Course.objects.filter(
+        catalog__in=CatalogCourseTag.objects.filter(tag__in=tags).values('catalog_course_id')
+    )
+
+
+def matching_consultancies(query='', country='', tag='', tag_prefix=''):
+    """Lazy queryset of verified consultancies matching a course query, tag and country"""
+    consultancies = Consultancy.objects.filter(is_verified=True)
+
+    if country:
+        consultancies = consultancies.filter(
+            id__in=ConsultancyCountry.objects.filter(country__key=normalize_name(country)).values('consultancy_id')
+        )
+
+    if query:
+        consultancies = consultancies.filter(
+            id__in=matching_courses(query).values('consultancy_id')
+        )
+
+    if tag or tag_prefix:
+        consultancies = consultancies.filter(
+            id__in=tagged_courses(tag, tag_prefix).values('consultancy_id')
+        )
+
+    return consultancies.order_by('id')
+
+
+def search_consultancies(query='', country='', tag='', tag_prefix=''):
+    """
+    Lazy ``values()`` queryset of the stored search results (consultancy.documents)
+    of matching_consultancies(), as ``{'id', 'payload'}`` rows. The matching
+    ids come from the indexes above; the documents only save serializing.
+    """
+    ids = matching_consultancies(query=query, country=country, tag=tag, tag_prefix=tag_prefix)
+    return (
+        SearchDocument.objects.filter(consultancy_id__in=ids.values('id'))
+        .values('payload', id=F('consultancy_id'))
+        .order_by('id')
+    )
@@ -1,10 +1,15 @@
 # serializers.py
 from rest_framework import serializers
-from .models import Consultancy, Course, User
+from .models import CatalogCourse, Consultancy, Course, User
 
 
 class CourseSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(max_length=100)
     consultancy_name = serializers.CharField(source='consultancy.name', read_only=True)
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=100, allow_blank=True),
+        source='tag_names', required=False
+    )
     
     class Meta:
         model = Course
@@ -13,12 +18,35 @@ class CourseSerializer(serializers.ModelSerializer):
             'consultancy': {'required': False}
         }
 
+    def create(self, validated_data):
+        # Name and tags select the shared catalog entry the course is offered as
+        tags = validated_data.pop('tag_names', [])
+        validated_data['catalog'] = CatalogCourse.objects.resolve_one(validated_data.pop('name'), tags)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        name = validated_data.pop('name', None)
+        tags = validated_data.pop('tag_names', None)
+        if name is not None or tags is not None:
+            instance.move_to(
+                instance.name if name is None else name,
+                instance.tag_names if tags is None else tags,
+                save=False,
+            )
+        return super().update(instance, validated_data)
+
 
 class ConsultancySerializer(serializers.ModelSerializer):
     courses = CourseSerializer(many=True, read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)
+    profile_image_thumbnail = serializers.ImageField(source='logo_thumbnail', read_only=True)
+    profile_image_medium = serializers.ImageField(source='logo_medium', read_only=True)
     is_admin = serializers.SerializerMethodField()
     is_consultancy = serializers.SerializerMethodField()
+    countries_operated = serializers.ListField(
+        child=serializers.CharField(max_length=100, allow_blank=True),
+        source='country_names', required=False
+    )
     
     def get_is_admin(self, obj):
         return obj.user.is_staff
@@ -29,7 +57,8 @@ class ConsultancySerializer(serializers.ModelSerializer):
     class Meta:
         model = Consultancy
         fields = [
-            'id', 'name', 'address', 'description', 'profile_image', 
+            'id', 'name', 'address', 'description', 'profile_image',
+            'profile_image_thumbnail', 'profile_image_medium',
             'phone_no', 'email', 'website', 'countries_operated', 
             'is_verified', 'courses', 'is_admin', 'is_consultancy'
         ]
@@ -37,6 +66,20 @@ class ConsultancySerializer(serializers.ModelSerializer):
             'profile_image': {'required': False, 'allow_null': True}
         }
 
+    def create(self, validated_data):
+        countries = validated_data.pop('country_names', None)
+        consultancy = super().create(validated_data)
+        if countries is not None:
+            consultancy.set_countries(countries)
+        return consultancy
+
+    def update(self, instance, validated_data):
+        countries = validated_data.pop('country_names', None)
+        consultancy = super().update(instance, validated_data)
+        if countries is not None:
+            consultancy.set_countries(countries)
+        return consultancy
+
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
@@ -0,0 +1,236 @@
+# signals.py
+import contextvars
+import functools
+from contextlib import contextmanager
+
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .models import CatalogCourse, ChangeLog, Consultancy, Course, User, catalog_created, links_changed
+from . import cache, documents, fulltext, images, search, suggest
+
+
+_batched = contextvars.ContextVar('batched', default=False)
+
+
+@contextmanager
+def batched():
+    """
+    Skip the per-row receivers marked with per_row() inside the block; the
+    caller (see consultancy.batch) runs their work once for all its rows.
+    """
+    token = _batched.set(True)
+    try:
+        yield
+    finally:
+        _batched.reset(token)
+
+
+def per_row(handler):
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not _batched.get():
+            return handler(*args, **kwargs)
+    return wrapper
+
+
+@receiver(catalog_created, sender=CatalogCourse)
+def index_catalog_courses(sender, instances, **kwargs):
+    """Index new catalog courses; entries never change once created"""
+    search.index_catalog_courses([course.id for course in instances])
+
+
+@receiver(post_delete, sender=Course)
+@per_row
+def prune_catalog(sender, instance, origin=None, **kwargs):
+    """Drop a catalog course once its last offering is gone"""
+    if not deleted_with_owner(origin):
+        CatalogCourse.objects.prune([instance.catalog_id])
+
+
+@receiver(pre_delete, sender=Consultancy)
+@per_row
+def collect_owner_catalog(sender, instance, **kwargs):
+    """
+    Note the catalog courses a consultancy offers before it goes; its courses
+    go in the same cascade (also when its user is deleted), which
+    prune_catalog leaves to prune_owner_catalog.
+    """
+    instance._catalog_ids = set(instance.courses.values_list('catalog_id', flat=True))
+
+
+@receiver(post_delete, sender=Consultancy)
+@per_row
+def prune_owner_catalog(sender, instance, **kwargs):
+    CatalogCourse.objects.prune(getattr(instance, '_catalog_ids', ()))
+
+
+@receiver(post_save, sender=Consultancy)
+def index_consultancy_document(sender, instance, raw=False, **kwargs):
+    """Keep the consultancy's full-text document current"""
+    if not raw:
+        fulltext.index_consultancy(instance.pk)
+
+
+@receiver(post_delete, sender=Consultancy)
+@per_row
+def remove_consultancy_document(sender, instance, **kwargs):
+    fulltext.remove_consultancy(instance.pk)
+
+
+@receiver([post_save, links_changed], sender=Consultancy)
+def refresh_search_document(sender, instance, raw=False, **kwargs):
+    """Keep the consultancy's search document current, or gone once it is unverified"""
+    if not raw:
+        documents.refresh_consultancy(instance.pk)
+
+
+@receiver(pre_save, sender=Course)
+@per_row
+def track_course_owner(sender, instance, raw=False, **kwargs):
+    """Note the consultancy a course is moved away from, whose documents list it too"""
+    instance._previous_consultancy_id = None
+    if not raw and not instance._state.adding:
+        previous = Course.objects.filter(pk=instance.pk).values_list('consultancy_id', flat=True).first()
+        if previous != instance.consultancy_id:
+            instance._previous_consultancy_id = previous
+
+
+def course_owners(instance):
+    """The course's consultancy, and the one it was just moved from"""
+    previous = getattr(instance, '_previous_consultancy_id', None)
+    return [instance.consultancy_id] + ([previous] if previous else [])
+
+
+@receiver([post_save, post_delete], sender=Course)
+@per_row
+def refresh_course_search_document(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or deleted_with_owner(origin):
+        return
+    documents.refresh(course_owners(instance))
+
+
+@receiver(post_save, sender=User)
+def refresh_user_search_document(sender, instance, raw=False, **kwargs):
+    # Documents carry the owner's email and flags
+    if instance.is_consultancy and not raw:
+        documents.refresh(Consultancy.objects.filter(user=instance).values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=Consultancy)
+def track_profile_image(sender, instance, raw=False, **kwargs):
+    """Note a new logo upload; save() writes it to storage after this signal"""
+    image = instance.profile_image
+    instance._profile_image_uploaded = not raw and bool(image) and not image._committed
+    if instance._profile_image_uploaded or not image:
+        # Variants of the previous logo must not outlive it
+        instance.profile_image_thumbnail = instance.profile_image_medium = None
+
+
+@receiver(post_save, sender=Consultancy)
+def process_profile_image(sender, instance, **kwargs):
+    if getattr(instance, '_profile_image_uploaded', False):
+        images.schedule(instance)
+
+
+@receiver([post_save, post_delete], sender=Course)
+@per_row
+def index_course_document(sender, instance, raw=False, origin=None, **kwargs):
+    # Course names and tags are part of their consultancy's document
+    if raw or deleted_with_owner(origin):
+        return
+    fulltext.index_consultancies(course_owners(instance))
+
+
+@receiver([post_save, post_delete], sender=Course)
+@per_row
+def touch_course_consultancy(sender, instance, raw=False, origin=None, **kwargs):
+    """A consultancy's profile embeds its courses, so their changes modify it too"""
+    if raw or deleted_with_owner(origin):
+        return
+    Consultancy.objects.filter(pk__in=course_owners(instance)).touch()
+
+
+@receiver(links_changed, sender=Consultancy)
+def touch_consultancy(sender, instance, **kwargs):
+    Consultancy.objects.filter(pk=instance.pk).touch()
+
+
+@receiver(post_save, sender=User)
+def touch_user_consultancy(sender, instance, raw=False, **kwargs):
+    # The profile shows the owner's email and flags
+    if instance.is_consultancy and not raw:
+        Consultancy.objects.filter(user=instance).touch()
+
+
+@receiver(post_save, sender=Course)
+def suggest_course_terms(sender, instance, raw=False, **kwargs):
+    """Keep the typeahead index in step with course names and tags"""
+    if not raw:
+        suggest.course_changed(instance)
+
+
+@receiver(post_delete, sender=Course)
+@per_row
+def forget_course_terms(sender, instance, **kwargs):
+    # Also on cascades: the index holds every course, verified or not
+    suggest.course_deleted(instance.pk)
+
+
+def deleted_with_owner(origin):
+    """Whether a post_delete is part of a cascade from a consultancy or user"""
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not Course
+
+
+@receiver(post_save, sender=Consultancy)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=User)
+def log_change(sender, instance, **kwargs):
+    """Feed the change to admin clients syncing through consultancy.changes"""
+    ChangeLog.objects.record(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Consultancy)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=User)
+@per_row
+def log_deletion(sender, instance, **kwargs):
+    # Also on cascades: clients hold every row, not just their owners
+    ChangeLog.objects.record(sender, [instance.pk], deleted=True)
+
+
+@receiver([post_save, post_delete, links_changed], sender=Consultancy)
+@receiver([post_save, post_delete], sender=Course)
+@per_row
+def invalidate_search(sender, instance, **kwargs):
+    """Search results embed consultancies and their courses"""
+    cache.invalidate(cache.SEARCH)
+
+
+@receiver([post_save, post_delete], sender=User)
+@per_row
+def invalidate_search_for_user(sender, instance, **kwargs):
+    # Results also carry the owner's email and flags
+    if instance.is_consultancy:
+        cache.invalidate(cache.SEARCH)
+
+
+@receiver([post_save, post_delete, links_changed], sender=Consultancy)
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=User)
+@per_row
+def invalidate_stats(sender, instance, **kwargs):
+    """The admin dashboard counts consultancies, users, courses and their links"""
+    cache.invalidate(cache.STATS)
+
+
+@receiver(post_delete, sender=Token)
+@receiver([post_save, post_delete], sender=User)
+@per_row
+def invalidate_tokens(sender, instance, **kwargs):
+    """Cached token -> user lookups must not outlive a revoked token or a changed user"""
+    cache.invalidate(cache.AUTH)
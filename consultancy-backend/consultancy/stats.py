@@ -0,0 +1,66 @@
+# stats.py
+"""
+Aggregate figures for the admin dashboard.
+
+Totals, the verification backlog and the most common countries and tags
+are counted by the database in five aggregate queries, and the result is
+cached in the ``stats`` namespace until a consultancy, user or course
+changes (consultancy.signals, and the bulk writers that bypass them). With a
+per-process cache, other workers would not see that invalidation, so the
+cached result is keyed by the change feed's cursor instead (changes.version).
+"""
+from django.db.models import Count, F, Min, Q
+from .models import Consultancy, ConsultancyCountry, Course, Tag, User
+from . import cache, changes
+
+
+# Length of the country and tag distributions
+TOP = 10
+
+
+def compute():
+    consultancies = Consultancy.objects.aggregate(
+        total=Count('id'),
+        verified=Count('id', filter=Q(is_verified=True)),
+        pending=Count('id', filter=Q(is_verified=False)),
+        # Registration time of the longest waiting consultancy
+        oldest_pending=Min('user__date_joined', filter=Q(is_verified=False)),
+    )
+    users = User.objects.aggregate(
+        total=Count('id'),
+        consultancies=Count('id', filter=Q(is_consultancy=True)),
+        admins=Count('id', filter=Q(is_staff=True)),
+    )
+    courses = Course.objects.aggregate(total=Count('id'), distinct=Count('catalog', distinct=True))
+
+    countries = (
+        ConsultancyCountry.objects.values(name=F('country__name'))
+        .annotate(consultancies=Count('id'), verified=Count('id', filter=Q(consultancy__is_verified=True)))
+        .order_by('-consultancies', 'name')[:TOP]
+    )
+    # Courses are offerings, so a tag counts once per consultancy offering a course with it
+    tags = (
+        Tag.objects.annotate(courses=Count('catalog_links__catalog_course__offerings'))
+        .filter(courses__gt=0)
+        .order_by('-courses', 'name')
+        .values('name', 'courses')[:TOP]
+    )
+
+    oldest = consultancies.pop('oldest_pending')
+    return {
+        'consultancies': consultancies,
+        'users': users,
+        'courses': courses,
+        'backlog': {
+            'pending': consultancies['pending'],
+            'waiting_since': oldest.isoformat() if oldest else None,
+        },
+        'countries': list(countries),
+        'tags': list(tags),
+    }
+
+
+def current():
+    """``(stats, hit)``, from the cache while nothing has changed"""
+    params = {} if cache.shared() else {'version': changes.version()}
+    return cache.cached(cache.STATS, params, compute)
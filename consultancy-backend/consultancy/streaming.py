@@ -0,0 +1,100 @@
+# streaming.py
+"""
+Streaming exports of whole listings.
+
+``?stream=json`` writes one JSON array and ``?stream=ndjson`` one object per
+line. Rows are read with ``QuerySet.iterator(chunk_size=...)``, so prefetches
+run per chunk, and each chunk is serialized and written before the next is
+read. Memory stays flat whatever the table size and the first bytes leave as
+soon as the first chunk is ready.
+
+Under ASGI, Django reads a synchronous body in one go, into a list, so
+response_body() hands it an async iterator instead that reads each chunk in
+the request's worker thread.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .pagination import paginated_response
+
+
+CHUNK_SIZE = 500
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def chunks(queryset, chunk_size):
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def stream_rows(queryset, serializer_class, fmt, chunk_size=CHUNK_SIZE):
+    """Yield the serialized rows of ``queryset`` as a JSON array or NDJSON text"""
+    first = True
+    if fmt == 'json':
+        yield '['
+    for chunk in chunks(queryset, chunk_size):
+        rows = serializer_class(chunk, many=True).data
+        if fmt == 'ndjson':
+            yield ''.join(encode(row) + '\n' for row in rows)
+        else:
+            body = ','.join(encode(row) for row in rows)
+            yield body if first else ',' + body
+            first = False
+    if fmt == 'json':
+        yield ']'
+
+
+async def read_async(iterator):
+    # One thread for the whole body, as database cursors belong to their thread
+    read = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (part := await read(iterator, done)) is not done:
+        yield part
+
+
+def response_body(request, content):
+    """``content``, an iterable, as a streaming body that the server running ``request`` reads piece by piece"""
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return read_async(iter(content))
+    return content
+
+
+def streaming_response(request, queryset, serializer_class, fmt, chunk_size=CHUNK_SIZE):
+    response = StreamingHttpResponse(
+        response_body(request, stream_rows(queryset.order_by('id'), serializer_class, fmt, chunk_size)),
+        content_type=CONTENT_TYPES[fmt],
+    )
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def list_response(request, queryset, serializer_class):
+    """The whole listing streamed when ``?stream=`` is given, otherwise one cursor page"""
+    fmt = request.GET.get('stream')
+    if not fmt:
+        return paginated_response(request, queryset, serializer_class)
+    if fmt not in CONTENT_TYPES:
+        return Response(
+            {'error': f"stream must be one of: {', '.join(CONTENT_TYPES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return streaming_response(request, queryset, serializer_class, fmt)
@@ -0,0 +1,211 @@
+# suggest.py
+"""
+Typeahead suggestions from an in-process prefix index.
+
+Every distinct course name and tag is a term, counted by the number of
+courses using it. Each word start of a term ("computer science", "science")
+is a key in one sorted array, so the terms for a prefix are a bisect plus a
+short scan, and the most used ones are suggested first. Nothing touches the
+database while the index is current.
+
+Course signals update the index in place once their transaction commits.
+Writes that bypass signals (bulk imports, seeding) call invalidate(), and
+every process rebuilds its index from two queries the next time it is asked.
+The ``suggest`` cache generation is how processes learn that another one
+changed something; with the default per-process cache they only see their own
+changes.
+
+The index also keeps the word vocabulary that fuzzy search corrects typos
+against (see consultancy.fuzzy).
+"""
+import heapq
+import threading
+from bisect import bisect_left, insort
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from .models import CatalogCourseTag, Course
+from . import cache, fuzzy
+
+
+COURSE = 'course'
+TAG = 'tag'
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Upper bound on index entries read for one prefix, to keep one-letter prefixes cheap
+MAX_SCAN = 2000
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def word_starts(key):
+    """Every suffix of ``key`` that starts a word"""
+    starts = [0] + [i + 1 for i, char in enumerate(key) if char == ' ']
+    return [key[i:] for i in starts]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.entries = []    # sorted (word start, kind, term key)
+        self.terms = {}      # (kind, term key) -> [display text, course count]
+        self.courses = {}    # course id -> (name key, tag keys), to undo on change
+        self.words = fuzzy.Vocabulary()
+        self.generation = None
+
+    # ----------------- Terms -----------------
+    def add_term(self, kind, text):
+        key = normalize(text)
+        if not key:
+            return None
+        for word in fuzzy.words(key):
+            self.words.add(word)
+        term = self.terms.get((kind, key))
+        if term is None:
+            self.terms[(kind, key)] = [text.strip(), 1]
+            for start in word_starts(key):
+                insort(self.entries, (start, kind, key))
+        else:
+            term[1] += 1
+        return key
+
+    def remove_term(self, kind, key):
+        term = self.terms.get((kind, key))
+        if term is None:
+            return
+        for word in fuzzy.words(key):
+            self.words.discard(word)
+        term[1] -= 1
+        if term[1] > 0:
+            return
+        del self.terms[(kind, key)]
+        for start in word_starts(key):
+            i = bisect_left(self.entries, (start, kind, key))
+            if i < len(self.entries) and self.entries[i] == (start, kind, key):
+                del self.entries[i]
+
+    # ----------------- Courses -----------------
+    def add_course(self, course_id, name, tags):
+        with self.lock:
+            self.remove_course(course_id)
+            name_key = self.add_term(COURSE, name)
+            tag_keys = {self.add_term(TAG, tag) for tag in {normalize(t): t for t in tags}.values()}
+            self.courses[course_id] = (name_key, tag_keys - {None})
+
+    def remove_course(self, course_id):
+        with self.lock:
+            name_key, tag_keys = self.courses.pop(course_id, (None, ()))
+            if name_key:
+                self.remove_term(COURSE, name_key)
+            for key in tag_keys:
+                self.remove_term(TAG, key)
+
+    def load(self, courses, generation):
+        """Replace the contents with ``courses``, an iterable of (id, name, tags)"""
+        with self.lock:
+            self.clear()
+            for course_id, name, tags in courses:
+                self.add_course(course_id, name, tags)
+            self.generation = generation
+
+    # ----------------- Lookup -----------------
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            matches = set()
+            i = bisect_left(self.entries, (prefix,))
+            end = min(len(self.entries), i + MAX_SCAN)
+            while i < end and self.entries[i][0].startswith(prefix):
+                _, kind, key = self.entries[i]
+                matches.add((kind, key))
+                i += 1
+            best = heapq.nsmallest(
+                limit, matches, key=lambda match: (-self.terms[match][1], self.terms[match][0])
+            )
+            return [
+                {'text': self.terms[match][0], 'kind': match[0], 'count': self.terms[match][1]}
+                for match in best
+            ]
+
+    def has_prefix(self, prefix):
+        i = bisect_left(self.entries, (prefix,))
+        return i < len(self.entries) and self.entries[i][0].startswith(prefix)
+
+    def correct(self, query):
+        """
+        ``(corrected query, corrections)``: every word of ``query`` that is not
+        in the vocabulary, nor the start of a word in it, replaced by its
+        closest vocabulary word when there is one within reach. Without any
+        correction the query comes back exactly as given, symbols and all.
+        """
+        with self.lock:
+            corrected, corrections = [], []
+            for term in fuzzy.words(query):
+                word = term
+                if term not in self.words and not self.has_prefix(term):
+                    word = self.words.closest(term) or term
+                if word != term:
+                    corrections.append({'term': term, 'correction': word})
+                corrected.append(word)
+            if not corrections:
+                return query, corrections
+            return ' '.join(corrected), corrections
+
+
+index = PrefixIndex()
+
+
+def course_rows():
+    tags = {}
+    for catalog_id, name in CatalogCourseTag.objects.order_by('id').values_list('catalog_course_id', 'tag__name'):
+        tags.setdefault(catalog_id, []).append(name)
+    courses = Course.objects.values_list('id', 'catalog_id', 'catalog__name')
+    for course_id, catalog_id, name in courses.iterator(chunk_size=2000):
+        yield course_id, name, tags.get(catalog_id, [])
+
+
+def rebuild(generation=None):
+    if generation is None:
+        generation = cache.get_generation(cache.SUGGEST)
+    index.load(course_rows(), generation)
+
+
+async def acurrent():
+    """The index, rebuilt first if another process or a bulk write has changed courses"""
+    generation = await cache.aget_generation(cache.SUGGEST)
+    if generation != index.generation:
+        await sync_to_async(rebuild)(generation)
+    return index
+
+
+def _applied(change):
+    """Apply a local change; keep the index current unless another process changed things too"""
+    with index.lock:
+        previous = index.generation
+        change()
+        generation = cache.bump_generation(cache.SUGGEST)
+        if previous is not None and generation == previous + 1:
+            index.generation = generation
+
+
+def course_changed(course):
+    """Re-add ``course`` with its current name and tags once the transaction commits"""
+    course_id, name, tags = course.pk, course.name, course.tag_names
+    transaction.on_commit(lambda: _applied(lambda: index.add_course(course_id, name, tags)))
+
+
+def course_deleted(course_id):
+    transaction.on_commit(lambda: _applied(lambda: index.remove_course(course_id)))
+
+
+def invalidate():
+    """Make every process rebuild its index, after writes that bypass signals"""
+    cache.invalidate(cache.SUGGEST)
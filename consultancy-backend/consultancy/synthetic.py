@@ -0,0 +1,111 @@
+# synthetic.py
+"""
+Synthetic catalog generator for benchmarks and load tests.
+
+Everything is written with bulk inserts, a batch of consultancies at a time,
+so seeding tens of thousands of rows takes seconds rather than minutes. Tag
+and country popularity follow a Zipf-like curve, which is what real catalogs
+look like: a handful of very common entries ("IELTS", "Australia") and a long
+tail of rare ones.
+"""
+import random
+
+from django.db import transaction
+from .models import (
+    CatalogCourse, ChangeLog, Consultancy, ConsultancyCountry, Country, Course, User,
+)
+from . import cache, documents, fulltext, suggest
+
+
+SUBJECTS = [
+    'Computer Science', 'Information Technology', 'Nursing', 'Business Administration',
+    'Accounting', 'Civil Engineering', 'Mechanical Engineering', 'Hospitality Management',
+    'Data Science', 'Cyber Security', 'Public Health', 'Pharmacy', 'Architecture',
+    'Psychology', 'Marketing', 'Finance', 'Law', 'Medicine', 'Biotechnology',
+    'Environmental Science', 'Graphic Design', 'Tourism', 'Agriculture', 'Economics',
+]
+LEVELS = ['Bachelor of', 'Master of', 'Diploma in', 'Graduate Certificate in', 'PhD in']
+TAGS = [
+    'IELTS', 'PTE', 'TOEFL', 'Scholarship', 'Undergraduate', 'Postgraduate', 'STEM',
+    'Health', 'Business', 'Engineering', 'Work Rights', 'Part Time', 'Online',
+    'Research', 'Foundation', 'Intake January', 'Intake July', 'Intake September',
+    'No Application Fee', 'Fast Track', 'GRE', 'GMAT', 'SAT', 'Co-op', 'Internship',
+]
+COUNTRIES = [
+    'Australia', 'UK', 'Canada', 'USA', 'New Zealand', 'Japan', 'Germany', 'Ireland',
+    'South Korea', 'France', 'Netherlands', 'Denmark', 'Finland', 'Cyprus', 'Malta',
+]
+
+
+def zipf_sample(rng, population, k):
+    """``k`` distinct items, earlier items of ``population`` far more likely"""
+    weights = [1 / (rank + 1) for rank in range(len(population))]
+    chosen = []
+    while len(chosen) < min(k, len(population)):
+        item = rng.choices(population, weights)[0]
+        if item not in chosen:
+            chosen.append(item)
+    return chosen
+
+
+def course_name(rng):
+    return f"{rng.choice(LEVELS)} {rng.choice(SUBJECTS)}"
+
+
+def seed_catalog(consultancies=100, courses=10, verified_ratio=0.8, seed=0, batch_size=200):
+    """
+    Create ``consultancies`` consultancy users, each with ``courses`` courses.
+    Returns the number of consultancies created.
+    """
+    rng = random.Random(seed)
+    countries = dict(zip(COUNTRIES, Country.objects.resolve(COUNTRIES)))
+    # Usernames continue after the highest user id, so repeated runs never collide
+    offset = (User.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+
+    for start in range(0, consultancies, batch_size):
+        size = min(batch_size, consultancies - start)
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(
+                    username=f'synthetic{offset + start + i}',
+                    email=f'synthetic{offset + start + i}@example.com',
+                    password='!',
+                    is_consultancy=True,
+                )
+                for i in range(size)
+            )
+            rows = Consultancy.objects.bulk_create(
+                Consultancy(
+                    user=user,
+                    name=f'Synthetic Consultancy {offset + start + i}',
+                    address=rng.choice(['Kathmandu', 'Lalitpur', 'Pokhara', 'Butwal', 'Chitwan']),
+                    description='Synthetic consultancy generated for benchmarking.',
+                    is_verified=rng.random() < verified_ratio,
+                )
+                for i, user in enumerate(users)
+            )
+            ConsultancyCountry.objects.bulk_create(
+                ConsultancyCountry(consultancy=consultancy, country=countries[name])
+                for consultancy in rows
+                for name in zipf_sample(rng, COUNTRIES, rng.randint(1, 4))
+            )
+            offered = [
+                (consultancy, course_name(rng), zipf_sample(rng, TAGS, rng.randint(0, 4)))
+                for consultancy in rows
+                for _ in range(courses)
+            ]
+            catalog = CatalogCourse.objects.resolve((name, names) for _, name, names in offered)
+            created = Course.objects.bulk_create(
+                Course(consultancy=consultancy, catalog=entry)
+                for (consultancy, _, _), entry in zip(offered, catalog)
+            )
+            ChangeLog.objects.record(User, [user.pk for user in users])
+            ChangeLog.objects.record(Consultancy, [consultancy.pk for consultancy in rows])
+            ChangeLog.objects.record(Course, [course.pk for course in created])
+            fulltext.index_consultancies([consultancy.id for consultancy in rows])
+            documents.refresh([consultancy.id for consultancy in rows])
+
+    cache.invalidate(cache.SEARCH)
+    cache.invalidate(cache.STATS)
+    suggest.invalidate()
+    return consultancies
@@ -12,6 +12,8 @@ urlpatterns = [
     
     # Consultancy Courses
     path('courses/add/', views.add_course),
+    path('courses/bulk/', views.bulk_add_courses),
+    path('courses/export/', views.export_courses),
     path('courses/edit/<int:course_id>/', views.edit_course),
     path('courses/delete/<int:course_id>/', views.delete_course),
     path('courses/link/', views.link_course),
@@ -19,17 +21,30 @@ urlpatterns = [
     
     # Public Search
     path('search/', views.search_consultancies),
+    path('search/suggest/', views.suggest_terms),
     
     # Admin - Consultancies
     path('admin/consultancies/', views.admin_list_consultancies),
     path('admin/consultancies/<int:consultancy_id>/', views.admin_consultancy_detail),
     path('admin/consultancies/verify/<int:consultancy_id>/', views.verify_consultancy),
+    path('admin/consultancies/bulk/', views.admin_bulk_consultancies),
     
     # Admin - Users
     path('admin/users/', views.admin_users),
     path('admin/users/<int:user_id>/', views.admin_user_detail),
+    path('admin/users/bulk/', views.admin_bulk_users),
     
     # Admin - Courses
     path('admin/courses/', views.admin_courses),
     path('admin/courses/<int:course_id>/', views.admin_course_detail),
+    path('admin/courses/bulk/', views.admin_bulk_courses),
+
+    # Admin - Stats
+    path('admin/stats/', views.admin_stats),
+
+    # Admin - Changes
+    path('admin/changes/', views.admin_changes),
+
+    # Admin - Caches
+    path('admin/cache/', views.admin_cache_stats),
 ]
\ No newline at end of file
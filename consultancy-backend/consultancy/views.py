@@ -3,9 +3,18 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Consultancy, Course, User
+from .models import Consultancy, Course, User, consultancy_prefetches, normalize_name
 from .serializers import ConsultancySerializer, CourseSerializer, UserSerializer
+from .pagination import apaginated_response, ranked_response
+from .asyncapi import async_api_view
+from .readers import ConsultancyReader
+from .streaming import list_response
+from . import batch, bulk, cache, changes, conditional, fulltext, search, stats, streaming, suggest
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db.models import aprefetch_related_objects
+from django.http import StreamingHttpResponse
 from rest_framework.authtoken.models import Token
 
 
@@ -62,10 +71,10 @@ def login_consultancy(request):
 
 
 # ----------------- Profile -----------------
-@api_view(['GET', 'PUT', 'DELETE'])
+@api_view(['PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
-def consultancy_profile(request):
-    """Get, update, or delete consultancy profile"""
+def edit_consultancy_profile(request):
+    """Update or delete consultancy profile"""
     
     if request.method == 'DELETE':
         # Delete account
@@ -74,12 +83,7 @@ def consultancy_profile(request):
     
     # Check if user is admin (no consultancy profile)
     if request.user.is_staff and not hasattr(request.user, 'consultancy'):
-        return Response({
-            'is_admin': True,
-            'is_consultancy': False,
-            'username': request.user.username,
-            'email': request.user.email
-        })
+        return Response(admin_profile(request.user))
     
     # Check if user has consultancy profile
     if not hasattr(request.user, 'consultancy'):
@@ -87,17 +91,47 @@ def consultancy_profile(request):
     
     consultancy = request.user.consultancy
 
-    if request.method == 'GET':
-        serializer = ConsultancySerializer(consultancy)
-        return Response(serializer.data)
-    
     # PUT - Update profile
-    if request.method == 'PUT':
-        serializer = ConsultancySerializer(consultancy, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    serializer = ConsultancySerializer(consultancy, data=request.data, partial=True)
+    if serializer.is_valid():
+        serializer.save()
+        return Response(serializer.data)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@async_api_view(['GET'], permission_classes=[IsAuthenticated], fallback=edit_consultancy_profile)
+async def consultancy_profile(request):
+    """Get consultancy profile (async); PUT and DELETE go to edit_consultancy_profile"""
+    consultancy = await Consultancy.objects.select_related('user').filter(user=request.user).afirst()
+
+    if consultancy is None:
+        # Admins have no consultancy profile
+        if request.user.is_staff:
+            return Response(admin_profile(request.user))
+        return Response({'error': 'User is not a consultancy'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # updated_at also moves when courses or countries change, so it versions the whole profile
+    headers = conditional.validators(
+        conditional.make_etag('profile', consultancy.pk, consultancy.updated_at.isoformat()),
+        consultancy.updated_at,
+        private=True,
+    )
+    response = conditional.not_modified(request, headers)
+    if response is not None:
+        return response
+
+    await aprefetch_related_objects([consultancy], *consultancy_prefetches())
+    serializer = ConsultancySerializer(consultancy)
+    return Response(serializer.data, headers=headers)
+
+
+def admin_profile(user):
+    return {
+        'is_admin': True,
+        'is_consultancy': False,
+        'username': user.username,
+        'email': user.email
+    }
 
 
 # ----------------- Course Management (Consultancy) -----------------
@@ -117,6 +151,59 @@ def add_course(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_add_courses(request):
+    """Add many courses at once from a CSV or JSON Lines body or uploaded file"""
+    if not hasattr(request.user, 'consultancy'):
+        return Response({'error': 'User is not a consultancy'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    consultancy = request.user.consultancy
+    content_type = request.content_type.split(';')[0].strip()
+
+    try:
+        if content_type == 'multipart/form-data':
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+            rows = bulk.parse(upload.read(), bulk.detect_format(upload.content_type, upload.name))
+        else:
+            rows = bulk.parse(request.body, bulk.detect_format(content_type))
+    except bulk.BulkImportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    validated, errors = bulk.validate(rows)
+    if errors:
+        return Response({
+            'error': f'{len(errors)} of {len(rows)} rows failed validation, nothing was imported',
+            'rows': errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    courses = bulk.import_courses(consultancy, validated)
+    return Response({'created': len(courses)}, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_courses(request):
+    """Stream all of the consultancy's courses as CSV (default), JSON or NDJSON"""
+    if not hasattr(request.user, 'consultancy'):
+        return Response({'error': 'User is not a consultancy'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    courses = Course.objects.with_related().filter(consultancy=request.user.consultancy)
+    fmt = request.GET.get('stream', 'csv')
+
+    if fmt == 'csv':
+        response = StreamingHttpResponse(
+            streaming.response_body(request, bulk.export_csv(courses)), content_type='text/csv'
+        )
+        response['Content-Disposition'] = 'attachment; filename="courses.csv"'
+        return response
+    if fmt in streaming.CONTENT_TYPES:
+        return streaming.streaming_response(request, courses, CourseSerializer, fmt)
+    return Response({'error': 'stream must be one of: csv, json, ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def edit_course(request, course_id):
@@ -170,15 +257,11 @@ def link_course(request):
         course = Course.objects.get(pk=course_id)
         
         # Check if already linked
-        if course.consultancy == consultancy:
+        if consultancy.courses.filter(catalog_id=course.catalog_id).exists():
             return Response({'error': 'Course already linked'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create a copy of the course for this consultancy
-        new_course = Course.objects.create(
-            consultancy=consultancy,
-            name=course.name,
-            tags=course.tags
-        )
+        # Offer the same catalog course; nothing is copied
+        new_course = Course.objects.create(consultancy=consultancy, catalog_id=course.catalog_id)
         return Response(CourseSerializer(new_course).data, status=status.HTTP_201_CREATED)
     
     except Course.DoesNotExist:
@@ -204,47 +287,109 @@ def unlink_course(request):
 
 
 # ----------------- Public Search -----------------
-@api_view(['GET'])
-def search_consultancies(request):
-    """Search for verified consultancies by course and country"""
+@async_api_view(['GET'])
+async def search_consultancies(request):
+    """Search for verified consultancies by course, tag and country (async; ?fuzzy=1 corrects typos)"""
     query = request.GET.get('query', '').strip()
     country = request.GET.get('country', '').strip()
+    tag = request.GET.get('tag', '').strip()
+    tag_prefix = request.GET.get('tag_prefix', '').strip()
+    mode = request.GET.get('mode', '').strip()
+    fuzzy = request.GET.get('fuzzy', '').strip().lower() in ('1', 'true')
+
+    if mode == 'fulltext':
+        if not query:
+            return Response({'error': 'Full-text search needs a query'}, status=status.HTTP_400_BAD_REQUEST)
+        if not fulltext.available():
+            return Response({'error': 'Full-text search is not available'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    try:
+        reader = ConsultancyReader.from_request(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Start with verified consultancies
-    consultancies = Consultancy.objects.filter(is_verified=True)
-    
-    # Filter by country if provided
-    if country:
-        consultancies = consultancies.filter(countries_operated__contains=[country])
-    
-    # If no query, return all (filtered by country if provided)
-    if not query:
-        serializer = ConsultancySerializer(consultancies, many=True)
-        return Response(serializer.data)
-    
-    # Filter by course name or tags
-    result = []
-    seen_ids = set()
-    
-    for c in consultancies:
-        for course in c.courses.all():
-            # Check if query matches course name or any tag
-            if (query.lower() in course.name.lower() or 
-                any(query.lower() in tag.lower() for tag in course.tags)):
-                if c.id not in seen_ids:
-                    result.append(c)
-                    seen_ids.add(c.id)
-                break
-    
-    serializer = ConsultancySerializer(result, many=True)
-    return Response(serializer.data)
+    params = {
+        'mode': mode,
+        'fuzzy': fuzzy,
+        'query': query.lower(),
+        'country': normalize_name(country),
+        'tag': normalize_name(tag),
+        'tag_prefix': normalize_name(tag_prefix),
+        'cursor': request.GET.get('cursor', ''),
+        'page_size': request.GET.get('page_size', ''),
+        'fields': reader.key,
+    }
+
+    def rank(text):
+        # The text query ranks; country and tags still filter
+        candidates = search.search_consultancies(country=country, tag=tag, tag_prefix=tag_prefix)
+        return ranked_response(
+            request,
+            lambda limit, after: fulltext.ranked(text, candidates, limit, after),
+            search.search_consultancies(),
+            reader.payloads,
+        ).data
+
+    async def run_search():
+        text, corrections = query, None
+        if fuzzy and query:
+            index = await suggest.acurrent()
+            text, corrections = index.correct(query)
+
+        if mode == 'fulltext':
+            # Ranking is raw SQL, which Django only runs synchronously
+            data = await sync_to_async(rank)(text)
+        else:
+            documents = search.search_consultancies(
+                query=text, country=country, tag=tag, tag_prefix=tag_prefix
+            )
+            data = (await apaginated_response(request, documents, reader.payloads)).data
+
+        if corrections is not None:
+            data = {**data, 'query': text, 'corrections': corrections}
+        return data
+
+    # Every change to search results bumps the cache generation, which makes it
+    # a version number for any result page. Other workers only see the bump
+    # through a shared cache. With a per-process one the change feed's cursor
+    # is added to the version, and keys the cached pages too; it costs a query,
+    # so it is read at most once per settings.SEARCH_VERSION_MAX_AGE seconds,
+    # and other workers' changes can take that long to show up here
+    version = await cache.aget_generation(cache.SEARCH)
+    if not cache.shared():
+        params['version'] = await changes.arecent_version(settings.SEARCH_VERSION_MAX_AGE)
+        version = f"{version}.{params['version']}"
+    headers = conditional.validators(conditional.make_etag('search', version, cache.digest(params)))
+    response = conditional.not_modified(request, headers)
+    if response is not None:
+        return response
+
+    data, hit = await cache.acached(cache.SEARCH, params, run_search)
+    return Response(data, headers={**headers, 'X-Cache': 'HIT' if hit else 'MISS'})
+
+
+@async_api_view(['GET'])
+async def suggest_terms(request):
+    """Course names and tags starting with the typed prefix, most used first (in memory)"""
+    query = request.GET.get('query', '').strip()
+    try:
+        limit = int(request.GET.get('limit', suggest.DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= suggest.MAX_LIMIT:
+        return Response(
+            {'error': f'limit must be between 1 and {suggest.MAX_LIMIT}'}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    index = await suggest.acurrent()
+    return Response({'query': query, 'suggestions': index.suggest(query, limit)})
 
 
 # ----------------- Admin - Consultancies -----------------
 @api_view(['GET', 'POST'])
 @permission_classes([IsAdminUser])
 def admin_list_consultancies(request):
-    """List all consultancies or create a new one"""
+    """List all consultancies (paged, or streamed with ?stream=json|ndjson; ?fields= for a subset) or create a new one"""
     if request.method == 'POST':
         # Create consultancy from admin panel
         data = request.data
@@ -263,10 +408,10 @@ def admin_list_consultancies(request):
                 'name': data.get('name'),
                 'address': data.get('address'),
                 'website': data.get('website'),
-                'countries_operated': data.get('countries_operated', [])
             }
             
             consultancy = Consultancy.objects.create(user=user, **consultancy_data)
+            consultancy.set_countries(data.get('countries_operated', []))
             serializer = ConsultancySerializer(consultancy)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
@@ -274,9 +419,11 @@ def admin_list_consultancies(request):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     # GET - List all consultancies
-    consultancies = Consultancy.objects.all()
-    serializer = ConsultancySerializer(consultancies, many=True)
-    return Response(serializer.data)
+    try:
+        reader = ConsultancyReader.from_request(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return list_response(request, reader.values(Consultancy.objects.all()), reader)
 
 
 @api_view(['PUT', 'DELETE'])
@@ -314,11 +461,18 @@ def verify_consultancy(request, consultancy_id):
     return Response({'success': 'Consultancy verified'})
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def admin_bulk_consultancies(request):
+    """Verify, unverify, update or delete many consultancies, picked by ids or a filter"""
+    return batch_response(batch.consultancies, request, Consultancy.objects.all())
+
+
 # ----------------- Admin - Users -----------------
 @api_view(['GET', 'POST'])
 @permission_classes([IsAdminUser])
 def admin_users(request):
-    """List all users or create a new one"""
+    """List all users (paged, or streamed with ?stream=json|ndjson) or create a new one"""
     if request.method == 'POST':
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
@@ -328,8 +482,7 @@ def admin_users(request):
     
     # GET - List all users
     users = User.objects.all()
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    return list_response(request, users, UserSerializer)
 
 
 @api_view(['PUT', 'DELETE'])
@@ -353,11 +506,18 @@ def admin_user_detail(request, user_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def admin_bulk_users(request):
+    """Update or delete many users, picked by ids or a filter; never the requesting admin"""
+    return batch_response(batch.users, request, User.objects.exclude(pk=request.user.pk))
+
+
 # ----------------- Admin - Courses -----------------
 @api_view(['GET', 'POST'])
 @permission_classes([IsAdminUser])
 def admin_courses(request):
-    """List all courses or create a new one"""
+    """List all courses (paged, or streamed with ?stream=json|ndjson) or create a new one"""
     if request.method == 'POST':
         serializer = CourseSerializer(data=request.data)
         if serializer.is_valid():
@@ -366,9 +526,8 @@ def admin_courses(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     # GET - List all courses
-    courses = Course.objects.all()
-    serializer = CourseSerializer(courses, many=True)
-    return Response(serializer.data)
+    courses = Course.objects.with_related()
+    return list_response(request, courses, CourseSerializer)
 
 
 @api_view(['PUT', 'DELETE'])
@@ -389,4 +548,56 @@ def admin_course_detail(request, course_id):
     if serializer.is_valid():
         serializer.save()
         return Response(serializer.data)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def admin_bulk_courses(request):
+    """Rename, retag or delete many courses, picked by ids or a filter"""
+    return batch_response(batch.courses, request, Course.objects.all())
+
+
+def batch_response(operations, request, queryset):
+    try:
+        return Response(operations.run(request.data, queryset))
+    except batch.BatchError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# ----------------- Admin - Stats -----------------
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_stats(request):
+    """Dashboard totals, verification backlog and top countries and tags"""
+    data, hit = stats.current()
+    return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+
+# ----------------- Admin - Changes -----------------
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_changes(request):
+    """Consultancies, users and courses changed or deleted since ?since=<cursor> (no cursor: the current one)"""
+    since = request.GET.get('since')
+    if since is None:
+        return Response(changes.latest())
+    try:
+        since = int(since)
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return Response({'error': 'since must be a cursor from an earlier response'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response(changes.poll(since))
+    except changes.CursorExpired as e:
+        return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+
+
+# ----------------- Admin - Caches -----------------
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_cache_stats(request):
+    """Hit/miss counters of the result caches"""
+    return Response({namespace: cache.stats(namespace) for namespace in (cache.SEARCH, cache.STATS)})
\ No newline at end of file
@@ -1,16 +1,31 @@
 // pages/AdminDashboard.jsx
 import { Icon } from "@iconify/react";
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import API from "../api/axios.js";
 
+// Rows replaced by their changed versions, new ones appended, deleted ones dropped
+const applyChanges = (rows, changed, deleted = []) => {
+  const byId = new Map(changed.map((row) => [row.id, row]));
+  const gone = new Set(deleted);
+  const known = new Set(rows.map((row) => row.id));
+  return [
+    ...rows
+      .filter((row) => !gone.has(row.id))
+      .map((row) => byId.get(row.id) || row),
+    ...changed.filter((row) => !known.has(row.id) && !gone.has(row.id)),
+  ];
+};
+
 export default function AdminDashboard() {
   const [activeTab, setActiveTab] = useState("verification");
   const [consultancies, setConsultancies] = useState([]);
   const [users, setUsers] = useState([]);
   const [courses, setCourses] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [verifyingId, setVerifyingId] = useState(null);
+  const [verifyingAll, setVerifyingAll] = useState(false);
 
   // Modal states
   const [showModal, setShowModal] = useState(false);
@@ -18,44 +33,123 @@ export default function AdminDashboard() {
   const [editingId, setEditingId] = useState(null);
   const [formData, setFormData] = useState({});
 
+  // Cursor of the next page of each list (null once fully loaded)
+  const [nextPages, setNextPages] = useState({});
+
+  // Change feed cursor; the lists are current up to it
+  const changesCursor = useRef(null);
+
   // Fetch data
-  const fetchConsultancies = async () => {
+  const fetchConsultancies = async (next) => {
     try {
-      const res = await API.get("/admin/consultancies/");
-      setConsultancies(res.data);
+      const res = await API.get(next || "/admin/consultancies/");
+      setConsultancies((prev) =>
+        next ? applyChanges(prev, res.data.results) : res.data.results
+      );
+      setNextPages((prev) => ({ ...prev, consultancies: res.data.next }));
     } catch (err) {
       setError("Failed to load consultancies");
       console.error(err);
     }
   };
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (next) => {
     try {
-      const res = await API.get("/admin/users/");
-      setUsers(res.data);
+      const res = await API.get(next || "/admin/users/");
+      setUsers((prev) =>
+        next ? applyChanges(prev, res.data.results) : res.data.results
+      );
+      setNextPages((prev) => ({ ...prev, users: res.data.next }));
     } catch (err) {
       setError("Failed to load users");
       console.error(err);
     }
   };
 
-  const fetchCourses = async () => {
+  const fetchCourses = async (next) => {
     try {
-      const res = await API.get("/admin/courses/");
-      setCourses(res.data);
+      const res = await API.get(next || "/admin/courses/");
+      setCourses((prev) =>
+        next ? applyChanges(prev, res.data.results) : res.data.results
+      );
+      setNextPages((prev) => ({ ...prev, courses: res.data.next }));
     } catch (err) {
       setError("Failed to load courses");
       console.error(err);
     }
   };
 
+  // The feed cursor is taken first, so changes made while loading are synced later
+  const loadLists = async () => {
+    try {
+      const res = await API.get("/admin/changes/");
+      changesCursor.current = res.data.cursor;
+    } catch (err) {
+      console.error(err);
+    }
+    await Promise.all([fetchConsultancies(), fetchUsers(), fetchCourses()]);
+  };
+
+  // Applies what changed since the last sync instead of reloading every list
+  const syncChanges = async () => {
+    if (changesCursor.current === null) return;
+    try {
+      let more = true;
+      while (more) {
+        const res = await API.get("/admin/changes/", {
+          params: { since: changesCursor.current },
+        });
+        const { deleted } = res.data;
+        setConsultancies((prev) =>
+          applyChanges(prev, res.data.consultancies, deleted.consultancies)
+        );
+        setUsers((prev) => applyChanges(prev, res.data.users, deleted.users));
+        setCourses((prev) =>
+          applyChanges(prev, res.data.courses, deleted.courses)
+        );
+        changesCursor.current = res.data.cursor;
+        more = res.data.more;
+      }
+    } catch (err) {
+      // The server no longer has every change since our cursor
+      if (err.response?.status === 410) {
+        await loadLists();
+      } else {
+        console.error(err);
+      }
+    }
+  };
+
+  // Totals come from the server; the lists above are only loaded page by page
+  const fetchStats = async () => {
+    try {
+      const res = await API.get("/admin/stats/");
+      setStats(res.data);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
+  const LoadMoreButton = ({ next, onLoad }) =>
+    next ? (
+      <button
+        onClick={() => onLoad(next)}
+        className="mt-6 mx-auto flex items-center gap-2 px-4 py-2 bg-gray-100 hover:bg-gray-200 text-gray-700 font-semibold rounded-lg transition"
+      >
+        <Icon icon="mdi:chevron-down" className="text-lg" />
+        Load more
+      </button>
+    ) : null;
+
   useEffect(() => {
     const loadInitialData = async () => {
       setLoading(true);
-      await Promise.all([fetchConsultancies(), fetchUsers(), fetchCourses()]);
+      await Promise.all([loadLists(), fetchStats()]);
       setLoading(false);
     };
     loadInitialData();
+    const timer = setInterval(syncChanges, 30000);
+    return () => clearInterval(timer);
   }, []);
 
   // ===== VERIFICATION =====
@@ -63,7 +157,7 @@ export default function AdminDashboard() {
     try {
       setVerifyingId(id);
       await API.put(`/admin/consultancies/verify/${id}/`);
-      await fetchConsultancies();
+      await Promise.all([syncChanges(), fetchStats()]);
       setError("");
     } catch (err) {
       setError("Failed to verify consultancy. Please try again.");
@@ -73,13 +167,32 @@ export default function AdminDashboard() {
     }
   };
 
+  // Verifies every pending consultancy in one request, loaded or not
+  const handleVerifyAllPending = async () => {
+    try {
+      setVerifyingAll(true);
+      await API.post("/admin/consultancies/bulk/", {
+        action: "verify",
+        filter: { is_verified: false },
+      });
+      await Promise.all([syncChanges(), fetchStats()]);
+      setError("");
+    } catch (err) {
+      setError("Failed to verify consultancies. Please try again.");
+      console.error(err);
+    } finally {
+      setVerifyingAll(false);
+    }
+  };
+
   // ===== CONSULTANCY OPERATIONS =====
   const handleCreateConsultancy = async () => {
     try {
       await API.post("/admin/consultancies/", formData);
       setShowModal(false);
       setFormData({});
-      fetchConsultancies();
+      syncChanges();
+      fetchStats();
     } catch (err) {
       setError("Failed to create consultancy");
       console.error(err);
@@ -92,7 +205,8 @@ export default function AdminDashboard() {
       setShowModal(false);
       setFormData({});
       setEditingId(null);
-      fetchConsultancies();
+      syncChanges();
+      fetchStats();
     } catch (err) {
       setError("Failed to update consultancy");
       console.error(err);
@@ -103,7 +217,8 @@ export default function AdminDashboard() {
     if (window.confirm("Are you sure you want to delete this consultancy?")) {
       try {
         await API.delete(`/admin/consultancies/${id}/`);
-        fetchConsultancies();
+        syncChanges();
+        fetchStats();
       } catch (err) {
         setError("Failed to delete consultancy");
         console.error(err);
@@ -134,7 +249,8 @@ export default function AdminDashboard() {
       await API.post("/admin/users/", formData);
       setShowModal(false);
       setFormData({});
-      fetchUsers();
+      syncChanges();
+      fetchStats();
     } catch (err) {
       setError("Failed to create user");
       console.error(err);
@@ -147,7 +263,8 @@ export default function AdminDashboard() {
       setShowModal(false);
       setFormData({});
       setEditingId(null);
-      fetchUsers();
+      syncChanges();
+      fetchStats();
     } catch (err) {
       setError("Failed to update user");
       console.error(err);
@@ -158,7 +275,8 @@ export default function AdminDashboard() {
     if (window.confirm("Are you sure you want to delete this user?")) {
       try {
         await API.delete(`/admin/users/${id}/`);
-        fetchUsers();
+        syncChanges();
+        fetchStats();
       } catch (err) {
         setError("Failed to delete user");
         console.error(err);
@@ -188,7 +306,8 @@ export default function AdminDashboard() {
       await API.post("/admin/courses/", formData);
       setShowModal(false);
       setFormData({});
-      fetchCourses();
+      syncChanges();
+      fetchStats();
     } catch (err) {
       setError("Failed to create course");
       console.error(err);
@@ -201,7 +320,8 @@ export default function AdminDashboard() {
       setShowModal(false);
       setFormData({});
       setEditingId(null);
-      fetchCourses();
+      syncChanges();
+      fetchStats();
     } catch (err) {
       setError("Failed to update course");
       console.error(err);
@@ -212,7 +332,8 @@ export default function AdminDashboard() {
     if (window.confirm("Are you sure you want to delete this course?")) {
       try {
         await API.delete(`/admin/courses/${id}/`);
-        fetchCourses();
+        syncChanges();
+        fetchStats();
       } catch (err) {
         setError("Failed to delete course");
         console.error(err);
@@ -485,6 +606,31 @@ export default function AdminDashboard() {
           </div>
         )}
 
+        {/* Totals */}
+        {stats && (
+          <div className="grid grid-cols-2 md:grid-cols-5 gap-4 mb-8">
+            {[
+              { label: "Consultancies", value: stats.consultancies.total },
+              { label: "Verified", value: stats.consultancies.verified },
+              { label: "Pending", value: stats.backlog.pending },
+              { label: "Users", value: stats.users.total },
+              { label: "Courses", value: stats.courses.total },
+            ].map((card) => (
+              <div
+                key={card.label}
+                className="bg-white border border-gray-200 rounded-lg p-4"
+              >
+                <p className="text-sm text-gray-600 font-medium">
+                  {card.label}
+                </p>
+                <p className="text-2xl font-bold text-gray-900">
+                  {card.value}
+                </p>
+              </div>
+            ))}
+          </div>
+        )}
+
         {/* Tabs */}
         <div className="flex gap-4 mb-8 border-b border-gray-200">
           {[
@@ -519,9 +665,24 @@ export default function AdminDashboard() {
         {/* Verification Tab */}
         {activeTab === "verification" && (
           <div>
-            <h2 className="text-2xl font-bold text-gray-900 mb-6">
-              Consultancy Verification
-            </h2>
+            <div className="flex items-center justify-between mb-6">
+              <h2 className="text-2xl font-bold text-gray-900">
+                Consultancy Verification
+              </h2>
+              {consultancies.some((c) => !c.is_verified) && (
+                <button
+                  onClick={handleVerifyAllPending}
+                  disabled={verifyingAll}
+                  className="flex items-center gap-2 bg-green-600 hover:bg-green-700 disabled:bg-gray-400 text-white font-semibold py-2 px-4 rounded-lg transition duration-200"
+                >
+                  <Icon
+                    icon={verifyingAll ? "mdi:loading" : "mdi:check-all"}
+                    className={`text-lg ${verifyingAll ? "animate-spin" : ""}`}
+                  />
+                  {verifyingAll ? "Verifying..." : "Verify All Pending"}
+                </button>
+              )}
+            </div>
             {consultancies.filter((c) => !c.is_verified).length > 0 ? (
               <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
                 {consultancies
@@ -718,6 +879,10 @@ export default function AdminDashboard() {
                 </div>
               ))}
             </div>
+            <LoadMoreButton
+              next={nextPages.consultancies}
+              onLoad={fetchConsultancies}
+            />
           </div>
         )}
 
@@ -783,6 +948,7 @@ export default function AdminDashboard() {
                 </tbody>
               </table>
             </div>
+            <LoadMoreButton next={nextPages.users} onLoad={fetchUsers} />
           </div>
         )}
 
@@ -833,6 +999,7 @@ export default function AdminDashboard() {
                 </div>
               ))}
             </div>
+            <LoadMoreButton next={nextPages.courses} onLoad={fetchCourses} />
           </div>
         )}
 
@@ -1,6 +1,6 @@
 // pages/Home.jsx
 import { Icon } from "@iconify/react";
-import { useState } from "react";
+import { useRef, useState } from "react";
 import API from "../api/axios.js";
 import AdsImage from "../assets/advertisement.jpg";
 import HeroImage from "../assets/hero-image.jpg";
@@ -17,10 +17,15 @@ export default function Home() {
   const [query, setQuery] = useState("");
   const [country, setCountry] = useState("");
   const [results, setResults] = useState([]);
+  // Cursor URL of the next page of results (null when there is none)
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
   const [showSuggestions, setShowSuggestions] = useState(false);
-  const [courseNames, setCourseNames] = useState([]);
+  const [suggestions, setSuggestions] = useState([]);
+  const [correctedQuery, setCorrectedQuery] = useState("");
+  const latestPrefix = useRef("");
 
   const searchConsultancy = async () => {
     if (!query && !country) {
@@ -32,16 +37,20 @@ export default function Home() {
     setLoading(true);
 
     try {
-      const res = await API.get(`/search/?query=${query}&country=${country}`);
-      const data = res.data;
+      const res = await API.get(`/search/?query=${query}&country=${country}`, {
+        // Only what the result cards show
+        params: {
+          fields: "name,profile_image_thumbnail,countries_operated,address,email,phone_no,website",
+          include: "courses",
+          // Tolerate typos; the response says what was corrected
+          fuzzy: 1,
+        },
+      });
+      const data = res.data.results;
 
       setResults(data);
-
-      // Collect all course names for suggestions
-      const allCourses = [
-        ...new Set(data.map((c) => c.courses.map((x) => x.name)).flat()),
-      ];
-      setCourseNames(allCourses);
+      setNextPage(res.data.next);
+      setCorrectedQuery(res.data.corrections?.length ? res.data.query : "");
     } catch (err) {
       setError("Failed to fetch consultancies. Try again.");
       console.error(err);
@@ -51,9 +60,40 @@ export default function Home() {
     }
   };
 
-  const filteredSuggestions = courseNames.filter((c) =>
-    c.toLowerCase().includes(query.toLowerCase())
-  );
+  // The next page keeps the search's parameters, so it can be fetched as is
+  const loadMoreResults = async () => {
+    setLoadingMore(true);
+    try {
+      const res = await API.get(nextPage);
+      setResults((prev) => [...prev, ...res.data.results]);
+      setNextPage(res.data.next);
+    } catch (err) {
+      setError("Failed to fetch more consultancies. Try again.");
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Typeahead: course names and tags starting with what has been typed
+  const fetchSuggestions = async (prefix) => {
+    latestPrefix.current = prefix;
+    if (!prefix.trim()) {
+      setSuggestions([]);
+      return;
+    }
+    try {
+      const res = await API.get("/search/suggest/", {
+        params: { query: prefix, limit: 8 },
+      });
+      // Ignore answers for prefixes the user has already typed past
+      if (latestPrefix.current === prefix) {
+        setSuggestions(res.data.suggestions.map((s) => s.text));
+      }
+    } catch (err) {
+      console.error(err);
+    }
+  };
 
   const handleSelectSuggestion = (c) => {
     setQuery(c);
@@ -95,12 +135,13 @@ export default function Home() {
                 onChange={(e) => {
                   setQuery(e.target.value);
                   setShowSuggestions(true);
+                  fetchSuggestions(e.target.value);
                 }}
                 className="px-4 py-2 rounded-xl w-full sm:w-80 text-gray-800 placeholder-gray-500 focus:outline-none focus:ring-2 focus:ring-blue-400 bg-white"
               />
-              {showSuggestions && query && filteredSuggestions.length > 0 && (
+              {showSuggestions && query && suggestions.length > 0 && (
                 <div className="absolute top-full left-0 mt-2 w-full sm:w-62 bg-white rounded-xl shadow-lg max-h-60 overflow-y-auto z-20">
-                  {filteredSuggestions.map((c, index) => (
+                  {suggestions.map((c, index) => (
                     <div
                       key={index}
                       className="px-4 py-2 hover:bg-gray-100 cursor-pointer text-black text-left border-b last:border-b-0"
@@ -161,10 +202,18 @@ export default function Home() {
             </div>
           )}
 
+          {correctedQuery && (
+            <p className="mb-2 text-gray-600 text-sm">
+              Showing results for{" "}
+              <span className="font-semibold">{correctedQuery}</span>
+            </p>
+          )}
+
           {results.length > 0 && (
             <div className="mb-4">
               <p className="text-gray-600 text-sm font-medium">
-                Found {results.length} consultancy
+                Found {results.length}
+                {nextPage ? "+" : ""} consultancy
                 {results.length !== 1 ? "ies" : ""} matching your search
               </p>
             </div>
@@ -177,9 +226,9 @@ export default function Home() {
                   key={c.id}
                   className="flex items-start gap-4 p-4 rounded-xl border border-gray-200 shadow-sm hover:shadow-md transition"
                 >
-                  {c.profile_image && (
+                  {c.profile_image_thumbnail && (
                     <img
-                      src={`http://localhost:8000${c.profile_image}`}
+                      src={`http://localhost:8000${c.profile_image_thumbnail}`}
                       alt={c.name}
                       className="w-16 h-16 object-cover rounded-md"
                     />
@@ -282,6 +331,21 @@ export default function Home() {
                   </div>
                 </li>
               ))}
+              {nextPage && (
+                <li>
+                  <button
+                    onClick={loadMoreResults}
+                    disabled={loadingMore}
+                    className="mx-auto flex items-center gap-2 px-4 py-2 bg-gray-100 hover:bg-gray-200 text-gray-700 font-semibold rounded-lg transition disabled:opacity-50"
+                  >
+                    <Icon
+                      icon={loadingMore ? "mdi:loading" : "mdi:chevron-down"}
+                      className={`text-lg ${loadingMore ? "animate-spin" : ""}`}
+                    />
+                    Load more
+                  </button>
+                </li>
+              )}
             </ul>
           ) : (
             !loading && (
@@ -44,10 +44,17 @@ export default function Profile() {
     }
   };
 
+  // Every page of the catalog, so any course can be picked
   const fetchAvailableCourses = async () => {
     try {
-      const res = await API.get("/admin/courses/");
-      setAvailableCourses(res.data || []);
+      const courses = [];
+      let next = "/admin/courses/";
+      while (next) {
+        const res = await API.get(next);
+        courses.push(...(res.data?.results || []));
+        next = res.data?.next;
+      }
+      setAvailableCourses(courses);
     } catch (err) {
       console.error("Failed to load courses", err);
     }
@@ -326,9 +333,9 @@ export default function Profile() {
                       alt="Logo preview"
                       className="h-40 w-40 object-cover rounded-lg mx-auto"
                     />
-                  ) : profile.profile_image ? (
+                  ) : profile.profile_image_medium ? (
                     <img
-                      src={`http://localhost:8000${profile.profile_image}`}
+                      src={`http://localhost:8000${profile.profile_image_medium}`}
                       alt={profile.name}
                       className="h-40 w-40 object-cover rounded-lg mx-auto"
                     />